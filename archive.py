@@ -0,0 +1,219 @@
+import hashlib
+import json
+import os
+import zlib
+
+from dedup import Splice
+
+INDEX_SUFFIX = '.index.json'
+INDEX_VERSION = 1
+COMPRESS_LEVEL = 6
+# zlib wbits for a gzip header and trailer around each member.
+GZIP_WBITS = 31
+
+
+def index_path(path):
+    return path + INDEX_SUFFIX
+
+
+def read_index(path):
+    with open(index_path(path), encoding='utf-8') as f:
+        index = json.load(f)
+    if index.get('version') != INDEX_VERSION:
+        raise ValueError(f"{index_path(path)}: unsupported index version {index.get('version')}")
+    return index
+
+
+class Archive:
+    """Random access to a dump saved by ArchiveSink.
+
+    entries maps each file path to its index record: offset and length of
+    its gzip member, size and blake2b hash of its text, and the file_size
+    and mtime_ns of the source file when it was dumped. Trailers (budget
+    summaries and the like) are kept in order but have no path.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        index = read_index(path)
+        self.settings = index.get('settings')
+        self.records = index['entries']
+        self.entries = {record['path']: record for record in self.records if record['path'] is not None}
+        self.file = open(path, 'rb')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def __contains__(self, file_path):
+        return file_path in self.entries
+
+    def paths(self):
+        return list(self.entries)
+
+    def raw(self, record):
+        """The compressed gzip member of an index record."""
+        self.file.seek(record['offset'])
+        return self.file.read(record['length'])
+
+    def read(self, file_path):
+        """Return the dump text of one file, '# File:' header included."""
+        return zlib.decompress(self.raw(self.entries[file_path]), GZIP_WBITS).decode('utf-8')
+
+    def __iter__(self):
+        """Yield (file_path, text) for every entry in dump order; trailers have a None path."""
+        for record in self.records:
+            yield record['path'], zlib.decompress(self.raw(record), GZIP_WBITS).decode('utf-8')
+
+    def diff(self, other):
+        """Return (added, removed, changed) paths of self relative to an older Archive, by hash."""
+        added = [path for path in self.entries if path not in other.entries]
+        removed = [path for path in other.entries if path not in self.entries]
+        changed = [path for path, record in self.entries.items()
+                   if path in other.entries and other.entries[path]['hash'] != record['hash']]
+        return added, removed, changed
+
+    def close(self):
+        self.file.close()
+
+
+class ReusedChunk:
+    """A chunk taken from a previous archive.
+
+    ArchiveSink copies its compressed bytes as they are; anything else
+    iterating it gets the decompressed text. size is its size in bytes.
+    """
+
+    def __init__(self, archive, record):
+        self.archive = archive
+        self.record = record
+        self.size = record['size']
+
+    def __iter__(self):
+        yield self.archive.read(self.record['path'])
+
+
+class ArchiveReuse(Splice):
+    """Holds back entries whose source is unchanged since the previous archive and splices in their old chunks."""
+
+    def __init__(self, previous):
+        super().__init__()
+        self.previous = previous
+        self.stats = {}
+        self.reused = 0
+
+    def filter(self, entries):
+        for entry in entries:
+            self.stats[entry.path] = (entry.size, entry.mtime_ns)
+            record = self.previous.entries.get(entry.path) if self.previous is not None else None
+            if record is not None and record.get('file_size') == entry.size and record.get('mtime_ns') == entry.mtime_ns:
+                self.reused += 1
+                self.hold(record)
+            else:
+                self.passed(entry.path)
+                yield entry
+
+    def release(self, record):
+        yield record['path'], ReusedChunk(self.previous, record)
+
+
+class ArchiveSink:
+    """Writes a dump as a gzip stream with one member per file, plus a JSON index next to it.
+
+    The data file is an ordinary multi-member gzip file, so zcat prints the
+    same flat dump as any other output. The index (path + INDEX_SUFFIX)
+    records where each file's member starts and how long it is, so Archive
+    can read single files back without decompressing the rest. When the
+    archive already exists and was made with the same settings, files whose
+    size and mtime are unchanged are copied over from it without being read
+    or compressed again. Both files are replaced only when the dump
+    completes.
+    """
+
+    status_stream = None
+
+    def __init__(self, path, level=COMPRESS_LEVEL):
+        self.path = path
+        self.level = level
+        self.message = f"written to archive {path}"
+        try:
+            self.previous = Archive(path)
+        except (OSError, ValueError, KeyError):
+            self.previous = None
+        self.reuse = None
+        self.settings = None
+        self.records = []
+        self.current = None
+        self.file = open(path + '.tmp', 'wb')
+
+    def reusing(self, entries, settings):
+        """Filter scanner Entries down to the ones that need processing; see splice()."""
+        self.settings = settings
+        previous = self.previous if self.previous is not None and self.previous.settings == settings else None
+        self.reuse = ArchiveReuse(previous)
+        return self.reuse.filter(entries)
+
+    def splice(self, chunks):
+        """Put the chunks of the entries reusing() held back into the processed chunk stream."""
+        return self.reuse.merge(chunks) if self.reuse is not None else chunks
+
+    def start_entry(self, file_path, chunk):
+        """Begin the member for file_path. Returns True if chunk was stored whole and must not be written."""
+        self._finish()
+        offset = self.file.tell()
+        if isinstance(chunk, ReusedChunk) and chunk.archive is self.previous:
+            raw = self.previous.raw(chunk.record)
+            self.file.write(raw)
+            self.records.append(dict(chunk.record, offset=offset, length=len(raw)))
+            return True
+        record = {'path': file_path, 'offset': offset, 'size': 0}
+        stat = self.reuse.stats.get(file_path) if self.reuse is not None else None
+        if stat is not None:
+            record['file_size'], record['mtime_ns'] = stat
+        self.current = (record, zlib.compressobj(self.level, zlib.DEFLATED, GZIP_WBITS), hashlib.blake2b(digest_size=16))
+        return False
+
+    def write(self, chunk):
+        if self.current is None:
+            self.start_entry(None, chunk)
+        record, compressor, digest = self.current
+        data = chunk.encode('utf-8')
+        digest.update(data)
+        record['size'] += len(data)
+        self.file.write(compressor.compress(data))
+
+    def _finish(self):
+        if self.current is None:
+            return
+        record, compressor, digest = self.current
+        self.file.write(compressor.flush())
+        record['length'] = self.file.tell() - record['offset']
+        record['hash'] = digest.hexdigest()
+        self.records.append(record)
+        self.current = None
+
+    def close(self):
+        self._finish()
+        self.file.close()
+        if self.previous is not None:
+            self.previous.close()
+        with open(index_path(self.path) + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump({'version': INDEX_VERSION, 'settings': self.settings, 'entries': self.records}, f)
+        os.replace(self.path + '.tmp', self.path)
+        os.replace(index_path(self.path) + '.tmp', index_path(self.path))
+        if self.reuse is not None and self.reuse.reused:
+            self.message = f"{self.message} ({self.reuse.reused} files reused)"
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+            return
+        self.file.close()
+        if self.previous is not None:
+            self.previous.close()
+        os.remove(self.path + '.tmp')
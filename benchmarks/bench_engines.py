@@ -0,0 +1,40 @@
+"""Compare the process_content engines on one large synthetic Python file.
+
+Usage: python benchmarks/bench_engines.py [--lines N] [--repeat N]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_parallel import SAMPLE
+from copy_files import ENGINES, get_engine
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the process_content engines.")
+    parser.add_argument("--lines", type=int, default=200000, help="Approximate lines in the synthetic file")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per engine; the best is reported")
+    args = parser.parse_args()
+
+    repeats = max(1, args.lines // SAMPLE.count('\n'))
+    content = "".join(SAMPLE.format(n=n) for n in range(repeats))
+    size_mb = len(content.encode('utf-8')) / 1e6
+    print(f"{content.count(chr(10))} lines, {size_mb:.1f} MB")
+    print(f"{'engine':>9} {'seconds':>9} {'MB/s':>8} {'out lines':>10}")
+
+    for name in ENGINES:
+        process = get_engine(name)
+        best = None
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            result = process(content, True)
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        print(f"{name:>9} {best:>9.3f} {size_mb / best:>8.1f} {result.count(chr(10)) + 1:>10}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""Measure how process_files scales with the number of worker processes.
+
+Usage: python benchmarks/bench_parallel.py [--files N] [--lines N]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from copy_files import iter_directory_files, process_files
+
+SAMPLE = '''import os
+from typing import (
+    List,
+    Dict,
+)
+
+class Worker{n}:
+    """
+    Docstring for worker {n}.
+    """
+    def run(self, items):
+        """Run the worker."""
+        logger.info(
+            "running %s",
+            items,
+        )
+        total = 0  # running total
+        for item in items:
+            try:
+                total += item
+            except TypeError as e:
+                logger.error(e)
+                raise
+        return total
+'''
+
+
+def make_tree(root, files, lines):
+    repeats = max(1, lines // SAMPLE.count('\n'))
+    for n in range(files):
+        subdir = os.path.join(root, f"pkg{n % 20}")
+        os.makedirs(subdir, exist_ok=True)
+        with open(os.path.join(subdir, f"mod{n}.py"), 'w', encoding='utf-8') as f:
+            f.write(SAMPLE.format(n=n) * repeats)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark --jobs scaling of copy_files.process_files.")
+    parser.add_argument("--files", type=int, default=2000, help="Number of synthetic files")
+    parser.add_argument("--lines", type=int, default=500, help="Approximate lines per file")
+    parser.add_argument("--max-jobs", type=int, default=os.cpu_count() or 1, help="Highest worker count to try")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as root:
+        make_tree(root, args.files, args.lines)
+        paths = list(iter_directory_files(root))
+
+        jobs_list = [1]
+        while jobs_list[-1] * 2 <= args.max_jobs:
+            jobs_list.append(jobs_list[-1] * 2)
+        if jobs_list[-1] != args.max_jobs:
+            jobs_list.append(args.max_jobs)
+
+        print(f"{len(paths)} files, {args.lines} lines each, {os.cpu_count()} CPUs")
+        print(f"{'jobs':>5} {'seconds':>9} {'speedup':>8}")
+        baseline = None
+        for jobs in jobs_list:
+            start = time.perf_counter()
+            for _ in process_files(paths, True, jobs):
+                pass
+            elapsed = time.perf_counter() - start
+            baseline = baseline or elapsed
+            print(f"{jobs:>5} {elapsed:>9.3f} {baseline / elapsed:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
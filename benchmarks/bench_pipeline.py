@@ -0,0 +1,156 @@
+"""Time each stage of a dump (scan, read, transform, emit) on synthetic trees.
+
+Usage: python benchmarks/bench_pipeline.py [--profiles small huge ...] [--scale F]
+                                           [--engine line] [--json results.json]
+                                           [--compare previous.json]
+
+Every profile from synth.py gets its own subtree and is measured on its own.
+Each stage reports seconds, files/s and MB/s (input bytes for scan, read and
+transform, output bytes for emit); the best of --repeat runs is kept. Peak
+RSS is the high-water mark of the whole run. --json saves the results and
+--compare prints the speedup of each stage against an earlier file.
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from copy_files import ENGINES, decode_content, get_engine
+from scanner import scan
+from sinks import FileSink
+from synth import PROFILES, make_repo
+
+STAGES = ('scan', 'read', 'transform', 'emit')
+
+
+def peak_rss_mb():
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere.
+    return peak / 1e6 if sys.platform == 'darwin' else peak / 1e3
+
+
+def git_revision():
+    try:
+        result = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__)))
+    except OSError:
+        return None
+    return result.stdout.strip() or None
+
+
+def run_stages(root, process, out_path):
+    """Run the pipeline once, stage by stage; return {stage: (seconds, files, bytes)}."""
+    timings = {}
+
+    start = time.perf_counter()
+    entries = list(scan(root))
+    in_bytes = sum(entry.size for entry in entries)
+    timings['scan'] = (time.perf_counter() - start, len(entries), in_bytes)
+
+    start = time.perf_counter()
+    data = []
+    for entry in entries:
+        with open(entry.path, 'rb') as f:
+            data.append(f.read())
+    timings['read'] = (time.perf_counter() - start, len(entries), in_bytes)
+
+    start = time.perf_counter()
+    texts = [process(decode_content(raw), True) for raw in data]
+    timings['transform'] = (time.perf_counter() - start, len(entries), in_bytes)
+
+    start = time.perf_counter()
+    with FileSink(out_path) as sink:
+        for entry, text in zip(entries, texts):
+            sink.write(f"# File: {entry.path}\n{text}\n\n")
+    timings['emit'] = (time.perf_counter() - start, len(entries), os.path.getsize(out_path))
+    return timings
+
+
+def rates(seconds, files, nbytes):
+    return {
+        'seconds': round(seconds, 6),
+        'files': files,
+        'bytes': nbytes,
+        'files_per_s': round(files / seconds, 1) if seconds else None,
+        'mb_per_s': round(nbytes / 1e6 / seconds, 2) if seconds else None,
+    }
+
+
+def compare(results, previous):
+    print(f"\nagainst {previous['meta'].get('revision')} ({previous['meta'].get('timestamp')}):")
+    for profile, stages in results.items():
+        old = previous['results'].get(profile)
+        if old is None:
+            continue
+        speedups = []
+        for stage in STAGES:
+            if stage in old and stages[stage]['seconds']:
+                speedups.append(f"{stage} {old[stage]['seconds'] / stages[stage]['seconds']:.2f}x")
+        print(f"{profile:>11}  {'  '.join(speedups)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the dump pipeline stage by stage.")
+    parser.add_argument("--profiles", nargs='+', choices=PROFILES, default=list(PROFILES), help="Synthetic trees to generate")
+    parser.add_argument("--scale", type=float, default=1.0, help="Multiplier for the size of every profile")
+    parser.add_argument("--engine", choices=ENGINES, default='line', help="process_content engine to time")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per profile; the best of each stage is kept")
+    parser.add_argument("--json", help="Write the results to this file")
+    parser.add_argument("--compare", help="Earlier --json file to compare against")
+    args = parser.parse_args()
+
+    process = get_engine(args.engine)
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        summary = make_repo(os.path.join(tmp, 'tree'), args.profiles, args.scale)
+        out_path = os.path.join(tmp, 'dump.txt')
+        for profile, (files, nbytes) in summary.items():
+            print(f"{profile}: {files} files, {nbytes / 1e6:.1f} MB")
+        print(f"{'profile':>11} {'stage':>10} {'seconds':>9} {'files/s':>10} {'MB/s':>8}")
+        for profile in args.profiles:
+            best = {}
+            for _ in range(args.repeat):
+                for stage, timing in run_stages(os.path.join(tmp, 'tree', profile), process, out_path).items():
+                    if stage not in best or timing[0] < best[stage][0]:
+                        best[stage] = timing
+            results[profile] = {stage: rates(*best[stage]) for stage in STAGES}
+            for stage in STAGES:
+                r = results[profile][stage]
+                print(f"{profile:>11} {stage:>10} {r['seconds']:>9.3f} {r['files_per_s']:>10} {r['mb_per_s']:>8}")
+
+    peak = peak_rss_mb()
+    print(f"peak RSS: {peak:.1f} MB" if peak is not None else "peak RSS: unavailable")
+    report = {
+        'meta': {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'revision': git_revision(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'engine': args.engine,
+            'scale': args.scale,
+            'repeat': args.repeat,
+        },
+        'peak_rss_mb': peak,
+        'results': results,
+    }
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            compare(results, json.load(f))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""Compare the old os.walk + pathlib traversal with scanner.scan.
+
+Usage: python benchmarks/bench_scan.py [PATH] [--include_ext .py ...]
+Without PATH a synthetic tree is generated.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scanner import Filters, scan
+
+
+def walk_pathlib(src, include_ext):
+    # The traversal copy_directory_to_clipboard used before scanner.py.
+    for root, dirs, files in os.walk(src):
+        for file in files:
+            file_path = Path(root) / file
+            if include_ext and file_path.suffix not in include_ext:
+                continue
+            file_path.stat()
+            yield file_path
+
+
+def make_tree(root, dirs=200, files_per_dir=100):
+    for d in range(dirs):
+        subdir = os.path.join(root, f"d{d % 10}", f"d{d}")
+        os.makedirs(subdir, exist_ok=True)
+        for n in range(files_per_dir):
+            ext = '.py' if n % 3 else '.txt'
+            open(os.path.join(subdir, f"f{n}{ext}"), 'w').close()
+
+
+def timed(label, fn):
+    start = time.perf_counter()
+    count = sum(1 for _ in fn())
+    print(f"{label:>14} {time.perf_counter() - start:>8.3f}s {count:>8} files")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark directory traversal.")
+    parser.add_argument("path", nargs='?', help="Tree to scan (default: synthetic)")
+    parser.add_argument("--include_ext", nargs='*', default=['.py'])
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        root = args.path
+        if root is None:
+            root = tmp
+            make_tree(root)
+        filters = Filters(include_ext=args.include_ext)
+        timed("os.walk+Path", lambda: walk_pathlib(root, args.include_ext))
+        timed("scanner.scan", lambda: scan(root, filters))
+
+
+if __name__ == "__main__":
+    main()
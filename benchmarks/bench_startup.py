@@ -0,0 +1,69 @@
+"""Measure CLI startup for a single-file copy and show which imports it pays for.
+
+Usage: python benchmarks/bench_startup.py [--runs N] [--top N] [-- extra copy_files.py args]
+
+Wall time is the best of --runs fresh interpreters, next to a bare
+`python -c pass` for reference. Imports come from one `python -X importtime`
+run; only top-level imports are listed, with their cumulative time.
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+SCRIPT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'copy_files.py')
+
+
+def best_wall_time(command, runs):
+    best = None
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run(command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def top_level_imports(command):
+    """Return [(cumulative microseconds, module)] for the imports made directly by the program or by site."""
+    result = subprocess.run([sys.executable, '-X', 'importtime'] + command[1:], capture_output=True, text=True, check=True)
+    imports = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        if not name.startswith('  '):
+            imports.append((int(cumulative), name.strip()))
+    return imports
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark copy_files.py startup on a single file.")
+    parser.add_argument("--runs", type=int, default=10, help="Fresh interpreters per measurement; the best is reported")
+    parser.add_argument("--top", type=int, default=15, help="Number of imports to list")
+    parser.add_argument("extra", nargs='*', help="Extra copy_files.py arguments (put them after --)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        source = os.path.join(tmp, 'one.py')
+        with open(source, 'w', encoding='utf-8') as f:
+            f.write('import os\n\n\ndef main():\n    """Entry point."""\n    return os.getcwd()\n')
+        # Writing to a file keeps the clipboard out of the measurement.
+        command = [sys.executable, SCRIPT, source, '--output', os.path.join(tmp, 'out.txt')] + args.extra
+
+        baseline = best_wall_time([sys.executable, '-c', 'pass'], args.runs)
+        wall = best_wall_time(command, args.runs)
+        print(f"python -c pass       {baseline * 1000:>8.1f} ms")
+        print(f"copy_files.py FILE   {wall * 1000:>8.1f} ms  (+{(wall - baseline) * 1000:.1f} ms)  {' '.join(command[3:])}")
+
+        imports = top_level_imports(command)
+        total = sum(cumulative for cumulative, _ in imports)
+        print(f"\n{total / 1000:.1f} ms in top-level imports; slowest {args.top}:")
+        for cumulative, name in sorted(imports, reverse=True)[:args.top]:
+            print(f"{cumulative / 1000:>8.1f} ms  {name}")
+
+
+if __name__ == "__main__":
+    main()
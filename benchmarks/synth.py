@@ -0,0 +1,91 @@
+"""Deterministic synthetic source trees for the benchmarks.
+
+Each profile stresses a different part of the pipeline: small (many tiny
+files, traversal and per-file overhead), huge (a few multi-MB files, the
+large-file path), deep (long directory chains), docstrings and logger (the
+rule engine's multi-line states). The same arguments always produce the
+same tree, so results from different runs can be compared.
+"""
+import os
+
+from bench_parallel import SAMPLE
+
+PROFILES = ('small', 'huge', 'deep', 'docstrings', 'logger')
+
+SMALL = '''import os
+
+def helper_{n}(value):
+    # small helper
+    return value + {n}
+'''
+
+DOCSTRING = '''def documented_{n}(a, b):
+    """
+    Summary line for function {n}.
+
+    Args:
+        a: the first operand, described at some length so that the
+           docstring spans several lines like real project docs do.
+        b: the second operand.
+
+    Returns:
+        The combined value.
+    """
+    return a + b
+
+'''
+
+LOGGER = '''def noisy_{n}(items):
+    logger.debug("starting %s", len(items))
+    for item in items:
+        logger.info(
+            "processing %s of %s",
+            item,
+            len(items),
+        )
+    logger.warning("done")
+    return items
+
+'''
+
+
+def _write(path, text):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(text)
+
+
+def make_repo(root, profiles=PROFILES, scale=1.0):
+    """Populate root with the given profiles; return {profile: (files, bytes)}."""
+    summary = {}
+
+    def count(profile, path):
+        files, nbytes = summary.get(profile, (0, 0))
+        summary[profile] = (files + 1, nbytes + os.path.getsize(path))
+
+    if 'small' in profiles:
+        for n in range(int(2000 * scale)):
+            path = os.path.join(root, 'small', f'pkg{n % 50}', f'm{n}.py')
+            _write(path, SMALL.format(n=n))
+            count('small', path)
+    if 'huge' in profiles:
+        repeats = int(5e6 * scale) // len(SAMPLE)
+        for n in range(3):
+            path = os.path.join(root, 'huge', f'big{n}.py')
+            _write(path, ''.join(SAMPLE.format(n=i) for i in range(repeats)))
+            count('huge', path)
+    if 'deep' in profiles:
+        path = os.path.join(root, 'deep')
+        for depth in range(max(1, int(40 * scale))):
+            path = os.path.join(path, f'level{depth}')
+            for n in range(5):
+                file_path = os.path.join(path, f'f{n}.py')
+                _write(file_path, SMALL.format(n=depth * 5 + n))
+                count('deep', file_path)
+    for profile, template in (('docstrings', DOCSTRING), ('logger', LOGGER)):
+        if profile in profiles:
+            for n in range(int(200 * scale)):
+                path = os.path.join(root, profile, f'p{n % 10}', f'{profile}{n}.py')
+                _write(path, ''.join(template.format(n=n * 50 + i) for i in range(50)))
+                count(profile, path)
+    return summary
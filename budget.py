@@ -0,0 +1,102 @@
+import os
+from collections import deque
+
+# Rough average for code with common LLM tokenizers; good enough to size a dump.
+BYTES_PER_TOKEN = 4
+PRIORITIES = ('size', 'recency', 'depth')
+# At most this many omitted files are named in the summary.
+SUMMARY_LIMIT = 50
+
+
+def approx_tokens(nbytes):
+    return (nbytes + BYTES_PER_TOKEN - 1) // BYTES_PER_TOKEN
+
+
+def header_size(file_path):
+    return len(f"# File: {file_path}\n\n\n".encode('utf-8'))
+
+
+def prioritize(entries, order):
+    """Sort scanner Entries so the files most worth keeping come first.
+
+    size puts small files first so more of them fit, recency puts recently
+    modified files first and depth puts files closest to the root first.
+    """
+    if order == 'size':
+        return sorted(entries, key=lambda e: e.size)
+    if order == 'recency':
+        return sorted(entries, key=lambda e: -e.mtime_ns)
+    if order == 'depth':
+        return sorted(entries, key=lambda e: e.path.count(os.sep))
+    if order is not None:
+        raise ValueError(f"Unknown priority: {order}")
+    return entries
+
+
+class Budget:
+    """Caps the size of a dump and records the files left out.
+
+    gate() leaves out, before they are read, only files whose stat size
+    alone is larger than the whole budget. Whether any other file fits is
+    decided by admit() from its processed size, which is usually smaller.
+    Neither depends on how far ahead of admit() the gated paths are
+    consumed, so a --jobs pool or --prefetch reading ahead produces the same
+    dump as a serial run. Omissions are listed in dump order.
+    """
+
+    def __init__(self, max_bytes=None, max_tokens=None):
+        limits = [limit for limit in (max_bytes, max_tokens and max_tokens * BYTES_PER_TOKEN) if limit]
+        self.limit = min(limits) if limits else None
+        self.used = 0
+        self.gated = set()
+        # (number of paths gate() had yielded before it, path, size) for each file gate() left out.
+        self.skipped = deque()
+        self.omitted = []
+
+    @property
+    def remaining(self):
+        return self.limit - self.used
+
+    def gate(self, entries):
+        """Yield the paths of entries that may fit, in order."""
+        for entry in entries:
+            if self.limit is not None and header_size(entry.path) + entry.size > self.limit:
+                self.skipped.append((len(self.gated), entry.path, entry.size))
+                continue
+            self.gated.add(entry.path)
+            yield entry.path
+
+    def _flush_skipped(self, before):
+        while self.skipped and (before is None or self.skipped[0][0] <= before):
+            _, path, size = self.skipped.popleft()
+            self.omitted.append((path, size))
+
+    def admit(self, chunks):
+        """Pass through the (file_path, chunk) pairs that fit, then yield (None, summary)."""
+        admitted = 0
+        for file_path, chunk in chunks:
+            if file_path in self.gated:
+                self._flush_skipped(admitted)
+                admitted += 1
+            # Streamed chunks are not measured up front; their size is an upper bound.
+            size = len(chunk.encode('utf-8')) if isinstance(chunk, str) else chunk.size
+            if self.limit is not None and size > self.remaining:
+                self.omitted.append((file_path, size))
+                continue
+            self.used += size
+            yield file_path, chunk
+        self._flush_skipped(None)
+
+        summary = self.summary()
+        if summary:
+            yield None, summary
+
+    def summary(self):
+        if not self.omitted:
+            return ""
+        lines = [f"# Budget: {self.used} of {self.limit} bytes used (~{approx_tokens(self.used)} tokens); "
+                 f"{len(self.omitted)} files omitted:"]
+        lines.extend(f"#   {path} ({size} bytes)" for path, size in self.omitted[:SUMMARY_LIMIT])
+        if len(self.omitted) > SUMMARY_LIMIT:
+            lines.append(f"#   ... and {len(self.omitted) - SUMMARY_LIMIT} more")
+        return '\n'.join(lines) + '\n'
@@ -0,0 +1,156 @@
+import hashlib
+import os
+import sqlite3
+import time
+
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+# Entries used within this window are not re-stamped, so warm runs stay read-only.
+TOUCH_INTERVAL = 24 * 60 * 60
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    mtime_ns INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    digest BLOB NOT NULL
+);
+CREATE TABLE IF NOT EXISTS entries (
+    digest BLOB NOT NULL,
+    variant TEXT NOT NULL,
+    content TEXT NOT NULL,
+    nbytes INTEGER NOT NULL,
+    last_used REAL NOT NULL,
+    PRIMARY KEY (digest, variant)
+);
+CREATE INDEX IF NOT EXISTS entries_last_used ON entries (last_used);
+"""
+
+
+def default_cache_path():
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "copy_files", "cache.sqlite3")
+
+
+class ContentCache:
+    """On-disk cache of process_content results.
+
+    Files are looked up by (path, mtime_ns, size) first, which costs one stat
+    and one indexed query. When that key is stale the file is read and its
+    blake2b digest is checked against stored entries, so touched or copied
+    files with unchanged bytes are still not re-processed. Entries are keyed
+    by digest and a variant string that must encode every setting the
+    transform depends on (rule version, modify flag, ...).
+
+    The cache may be passed to worker processes: the connection is not
+    pickled and each process opens its own.
+    """
+
+    def __init__(self, path=None, max_bytes=DEFAULT_MAX_BYTES):
+        self.path = path or default_cache_path()
+        self.max_bytes = max_bytes
+        self._conn = None
+        self._pid = None
+
+    def __getstate__(self):
+        return {"path": self.path, "max_bytes": self.max_bytes}
+
+    def __setstate__(self, state):
+        self.__init__(state["path"], state["max_bytes"])
+
+    def _db(self):
+        if self._conn is None or self._pid != os.getpid():
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(SCHEMA)
+            self._conn = conn
+            self._pid = os.getpid()
+        return self._conn
+
+    def get(self, file_path, variant, transform, st=None, read=None):
+        """Return transform(bytes of file_path), reusing a cached result when possible.
+
+        st may be passed when the caller already stat'ed the file. read, if
+        given, loads the bytes on a miss instead of a plain read; exceptions
+        it raises propagate and nothing is stored.
+        """
+        path = os.path.abspath(file_path)
+        if st is None:
+            st = os.stat(path)
+        content = self.lookup(path, variant, st)
+        if content is not None:
+            return content
+
+        db = self._db()
+        now = time.time()
+        if read is not None:
+            data = read(path)
+        else:
+            with open(path, 'rb') as f:
+                data = f.read()
+        digest = hashlib.blake2b(data, digest_size=16).digest()
+
+        row = db.execute("SELECT content FROM entries WHERE digest = ? AND variant = ?",
+                         (digest, variant)).fetchone()
+        content = row[0] if row is not None else transform(data)
+
+        with db:
+            db.execute("BEGIN")
+            db.execute("INSERT OR REPLACE INTO files (path, mtime_ns, size, digest) VALUES (?, ?, ?, ?)",
+                       (path, st.st_mtime_ns, st.st_size, digest))
+            db.execute("INSERT OR REPLACE INTO entries (digest, variant, content, nbytes, last_used) "
+                       "VALUES (?, ?, ?, ?, ?)",
+                       (digest, variant, content, len(content), now))
+        return content
+
+    def lookup(self, file_path, variant, st=None):
+        """Return the result get() would give from file_path's (path, mtime_ns, size) key, or None, without reading it.
+
+        st may be passed when the caller already stat'ed the file.
+        """
+        db = self._db()
+        path = os.path.abspath(file_path)
+        if st is None:
+            st = os.stat(path)
+        row = db.execute(
+            "SELECT e.digest, e.content, e.last_used FROM files f "
+            "JOIN entries e ON e.digest = f.digest AND e.variant = ? "
+            "WHERE f.path = ? AND f.mtime_ns = ? AND f.size = ?",
+            (variant, path, st.st_mtime_ns, st.st_size)).fetchone()
+        if row is None:
+            return None
+        digest, content, last_used = row
+        now = time.time()
+        if now - last_used > TOUCH_INTERVAL:
+            db.execute("UPDATE entries SET last_used = ? WHERE digest = ? AND variant = ?",
+                       (now, digest, variant))
+        return content
+
+    def evict(self):
+        """Drop least recently used entries until the cache fits in max_bytes."""
+        db = self._db()
+        total = db.execute("SELECT COALESCE(SUM(nbytes), 0) FROM entries").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+
+        with db:
+            db.execute("BEGIN")
+            rows = db.execute("SELECT digest, variant, nbytes FROM entries ORDER BY last_used").fetchall()
+            for digest, variant, nbytes in rows:
+                if total <= self.max_bytes:
+                    break
+                db.execute("DELETE FROM entries WHERE digest = ? AND variant = ?", (digest, variant))
+                total -= nbytes
+            db.execute("DELETE FROM files WHERE digest NOT IN (SELECT digest FROM entries)")
+
+    def close(self):
+        self.evict()
+        self._conn.close()
+        self._conn = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
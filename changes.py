@@ -0,0 +1,107 @@
+import hashlib
+import json
+import os
+import subprocess
+from pathlib import Path
+
+from scanner import Entry, path_allowed
+
+
+def _git(args, cwd):
+    result = subprocess.run(['git'] + args, cwd=cwd, capture_output=True)
+    if result.returncode != 0:
+        # Only the first line; a misused git command prints its whole usage text after it.
+        message = result.stderr.decode(errors='replace').strip().split('\n', 1)[0]
+        raise RuntimeError(f"git {' '.join(args)} failed: {message}")
+    return [name for name in result.stdout.decode('utf-8', errors='surrogateescape').split('\0') if name]
+
+
+def verify_ref(src, ref):
+    """Raise ValueError unless src is in a git work tree where ref names a commit.
+
+    git_changed_entries only runs git once it is iterated, so callers check
+    first, before any output is opened.
+    """
+    cwd = src if os.path.isdir(src) else os.path.dirname(src) or '.'
+    try:
+        _git(['rev-parse', '--is-inside-work-tree'], cwd)
+    except (RuntimeError, OSError):
+        raise ValueError(f"--since needs a git work tree: {src} is not in one") from None
+    try:
+        _git(['rev-parse', '--verify', '--quiet', f'{ref}^{{commit}}'], cwd)
+    except RuntimeError:
+        raise ValueError(f"--since: unknown git revision {ref!r}") from None
+
+
+def git_changed_entries(src, ref, filters=None):
+    """Yield Entries for files under src that differ from ref, plus untracked files.
+
+    Only the files git reports are stat'ed; the tree itself is never walked.
+    Deleted files are dropped. filters is applied as if the files had been
+    found by scanner.walk.
+    """
+    changed = _git(['diff', '--name-only', '--relative', '-z', ref, '--'], src)
+    untracked = _git(['ls-files', '--others', '--exclude-standard', '-z'], src)
+    top = os.fspath(Path(src))
+    prefix = '' if top == '.' else top.rstrip(os.sep) + os.sep
+    for relpath in sorted(set(changed) | set(untracked)):
+        if filters is not None and not path_allowed(filters, relpath):
+            continue
+        path = prefix + relpath.replace('/', os.sep)
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            continue
+        yield Entry(path, os.path.basename(path), False, st.st_size, st.st_mtime_ns)
+
+
+def default_manifest_path(src):
+    """Where the manifest of src lives; src may also be a list of sources dumped together."""
+    from cache import default_cache_path
+    sources = [src] if isinstance(src, (str, os.PathLike)) else src
+    name = '\0'.join(sorted(os.path.abspath(source) for source in sources))
+    key = hashlib.blake2b(name.encode('utf-8'), digest_size=8).hexdigest()
+    return os.path.join(os.path.dirname(default_cache_path()), 'manifests', f'{key}.json')
+
+
+class Manifest:
+    """path -> (mtime_ns, size) of the files a previous dump of src contained.
+
+    changed() passes through only entries that are new or whose stat differs.
+    A file is recorded as dumped only once its chunk comes through record(),
+    so files dropped by a budget are offered again next time.
+    """
+
+    def __init__(self, src, path=None):
+        self.path = path or default_manifest_path(src)
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                self.previous = json.load(f)
+        except (OSError, ValueError):
+            self.previous = {}
+        self.current = {}
+        self.candidates = {}
+
+    def changed(self, entries):
+        for entry in entries:
+            key = os.path.abspath(entry.path)
+            stamp = [entry.mtime_ns, entry.size]
+            if self.previous.get(key) == stamp:
+                self.current[key] = stamp
+                continue
+            self.candidates[os.fspath(entry.path)] = (key, stamp)
+            yield entry
+
+    def record(self, chunks):
+        for file_path, chunk in chunks:
+            if file_path is not None and os.fspath(file_path) in self.candidates:
+                key, stamp = self.candidates.pop(os.fspath(file_path))
+                self.current[key] = stamp
+            yield file_path, chunk
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.current, f)
+        os.replace(tmp_path, self.path)
@@ -0,0 +1,107 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from copy_files import dump_entries, iter_directory_entries, process_files, write_chunks
+from rules import DEFAULT_RULES
+from scanner import Filters
+from sinks import StringSink, open_sink
+
+
+class Copier:
+    """A configured dumper for callers that make many dumps in one process.
+
+    It takes the same options as copy_to_clipboard, split into the ones fixed
+    at construction (filters, processing, cache) and the ones chosen per
+    dump(). The process pool for jobs != 1 is started on first use and kept,
+    so later dumps skip worker startup and reuse the workers' cache
+    connections. With watch=True each source directory gets a
+    file_index.FileIndex of what the filters pass, kept current in the
+    background, so repeated dumps of the same tree do not walk the disk.
+    close() releases everything, including the cache. dedup=True
+    deduplicates every dump (see dedup.Deduplicator).
+    """
+
+    def __init__(self, include_ext=None, exclude_ext=None, include_dirs=None, exclude_dirs=None, modify_python=True, jobs=1, cache=None, engine='line', rules=DEFAULT_RULES, include_globs=None, exclude_globs=None, gitignore=False, large_files=None, hooks=None, watch=False, dedup=False, prefetch=0):
+        self.filter_args = (include_ext, exclude_ext, include_dirs, exclude_dirs, include_globs, exclude_globs)
+        self.modify_python = modify_python
+        self.jobs = (os.cpu_count() or 1) if jobs == 0 else jobs
+        self.cache = cache
+        self.engine = engine
+        self.rules = rules
+        self.gitignore = gitignore
+        self.large_files = large_files
+        self.hooks = hooks
+        self.watch = watch
+        self.dedup = dedup
+        self.prefetch = prefetch
+        self.executor = None
+        self.indexes = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def pool(self):
+        if self.jobs <= 1:
+            return None
+        if self.executor is None:
+            self.executor = ProcessPoolExecutor(max_workers=self.jobs)
+        return self.executor
+
+    def entries(self, src, since=None):
+        """Yield the scanner Entries a dump of directory src would consider."""
+        include_ext, exclude_ext, include_dirs, exclude_dirs, include_globs, exclude_globs = self.filter_args
+        if not self.watch or since is not None:
+            return iter_directory_entries(src, include_ext, exclude_ext, include_dirs, exclude_dirs, include_globs, exclude_globs, self.gitignore, since)
+
+        key = os.path.abspath(src)
+        index = self.indexes.get(key)
+        if index is None:
+            filters = Filters(*self.filter_args)
+            if self.gitignore:
+                from ignore import IgnoreFilters
+                filters = IgnoreFilters(src, filters)
+            # The index only holds what the filters pass, so excluded trees are never watched.
+            from file_index import FileIndex
+            index = self.indexes[key] = FileIndex(src, filters).build()
+            index.watch()
+        return (entry for _, _, files in index.walk() for entry in files)
+
+    def dump(self, path, output=None, budget=None, priority=None, since=None, manifest=None):
+        """Dump a file or directory to output (anything open_sink accepts) and return the sink."""
+        start = time.perf_counter()
+        sink = open_sink(output)
+        if os.path.isdir(path):
+            dedup = None
+            if self.dedup:
+                from dedup import Deduplicator
+                dedup = Deduplicator()
+            dump_entries(self.entries(path, since), sink, self.modify_python, self.jobs, self.cache, self.engine, self.rules,
+                         budget, priority, manifest, self.large_files, self.hooks, self.pool(), dedup, self.prefetch)
+        elif os.path.isfile(path):
+            # One file is never worth a round trip to the pool.
+            chunks = process_files([path], self.modify_python, 1, self.cache, self.engine, self.rules, self.large_files, self.hooks)
+            write_chunks(chunks, sink, self.hooks)
+        else:
+            raise FileNotFoundError(path)
+        if self.hooks is not None:
+            self.hooks.emit('done', time.perf_counter() - start)
+        return sink
+
+    def render(self, path, budget=None, priority=None, since=None, manifest=None):
+        """Return the dump of path as a string."""
+        return self.dump(path, StringSink(), budget, priority, since, manifest).value()
+
+    def close(self):
+        if self.executor is not None:
+            self.executor.shutdown()
+            self.executor = None
+        for index in self.indexes.values():
+            index.close()
+        self.indexes = {}
+        if self.cache is not None:
+            self.cache.close()
+            self.cache = None
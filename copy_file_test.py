@@ -1,5 +1,31 @@
+import codecs
+import gzip
+import io
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
 import unittest
-from copy_files import process_content
+from unittest import mock
+from budget import Budget, prioritize
+from cache import ContentCache
+from changes import Manifest, git_changed_entries
+from copier import Copier
+from file_index import FileIndex, PollingWatcher
+from large_files import LargeFilePolicy, StreamedChunk
+from copy_files import copy_directory_to_clipboard, copy_to_clipboard, get_engine, main, single_file_args, iter_directory_files, process_content, process_file, process_files
+from pathlib import Path
+from rules import DEFAULT_RULES, parse_rules
+from ignore import IgnoreFilters
+from scanner import Filters, scan, suffix
+from skeleton import process_content_skeleton
+from sinks import LimitedClipboardSink, NullSink, PipeClipboardSink, clipboard_sink
+from stats import Hooks, Stats, run_profiled
+from tokenize_engine import process_content_tokenize
+
 
 class TestProcessContent(unittest.TestCase):
 
@@ -205,8 +231,889 @@ x = 1'''
         x = 2'''
         self.assertEqual(process_content(content, True), content)
 
+    def test_skips_state_machine_when_no_rule_applies(self):
+        content = "x = 1\n\n    \ny = x  \n"
+        with mock.patch('copy_files.LineProcessor') as processor:
+            self.assertEqual(process_content(content, True), "x = 1\ny = x  ")
+        processor.assert_not_called()
+
+    def test_only_applicable_rules_run(self):
+        from rules import applicable_rules
+        content = "def f():\n    logger.info('x')  # c\n"
+        self.assertEqual(applicable_rules(content, DEFAULT_RULES), ('logger', 'comments'))
+        self.assertEqual(process_content(content, True), "def f():")
+
+
+
+class TestTokenizeEngine(TestProcessContent):
+    """Runs every TestProcessContent case against the tokenize engine."""
+
+    def setUp(self):
+        patcher = mock.patch(f'{__name__}.process_content', process_content_tokenize)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_hash_after_quote_in_string(self):
+        content = "x = 'it''s'  # comment\ny = \"#\"  # other"
+        expected = "x = 'it''s'\ny = \"#\""
+        self.assertEqual(process_content_tokenize(content, True), expected)
+
+    def test_triple_quotes_inside_docstring(self):
+        content = """def f():
+    '''Mentions \"\"\" quotes
+    '''
+    return 1"""
+        expected = "def f():\n    return 1"
+        self.assertEqual(process_content_tokenize(content, True), expected)
+
+    def test_one_line_docstring_kept_like_line_engine(self):
+        content = 'def f():\n    """Doc."""\n    return 1'
+        self.assertEqual(process_content_tokenize(content, True), content)
+        self.assertEqual(process_content_tokenize(content, True), get_engine('line')(content, True))
+
+    def test_bare_except_kept_like_line_engine(self):
+        content = "try:\n    f()\nexcept:\n    g()"
+        self.assertEqual(process_content_tokenize(content, True), content)
+        self.assertEqual(process_content_tokenize(content, True), get_engine('line')(content, True))
+
+    def test_falls_back_on_untokenizable_source(self):
+        content = "x = (1,\n# comment"
+        self.assertEqual(process_content_tokenize(content, True), "x = (1,")
+
+
+class TestSkeleton(unittest.TestCase):
+
+    content = '''import os
+
+
+@decorator(arg=1)
+def f(a: int = 1,
+      b=lambda: 2) -> dict:  # signature comment
+    """
+    Summary of f.
+
+    Details.
+    """
+    text = """
+def not_a_function():
+"""
+    return {}
+
+
+def g(x): return x
+
+
+class A(Base):
+    """Class doc."""
+    attr = 3
+
+    async def h(self):
+        if self:
+            return 1
+        return 2
+'''
+
+    def test_bodies_collapse_to_ellipsis(self):
+        expected = '''# Imports omitted for brevity...
+@decorator(arg=1)
+def f(a: int = 1,
+      b=lambda: 2) -> dict:
+    ...
+def g(x): ...
+class A(Base):
+    attr = 3
+    async def h(self):
+        ...'''
+        self.assertEqual(process_content_skeleton(self.content, True), expected)
+
+    def test_keeps_first_docstring_line_without_docstrings_rule(self):
+        result = process_content_skeleton(self.content, True, ('imports', 'comments'))
+        self.assertIn('def f(a: int = 1,\n      b=lambda: 2) -> dict:\n    """Summary of f."""\n    ...\n', result)
+        self.assertIn('class A(Base):\n    """Class doc."""\n    attr = 3\n', result)
+        self.assertNotIn('Details', result)
+
+    def test_kept_string_is_not_outlined(self):
+        from skeleton import outline
+        content = 'USAGE = """\ndef handler(e):\n    return e\n"""\nclass A:\n    X = \'\'\'\n    def m(self):\n        pass\n\'\'\'\n    y = 1'
+        self.assertEqual('\n'.join(outline(content.split('\n'))), content)
+        self.assertEqual(process_content_skeleton(content, True, ('imports', 'comments')), content)
+
+    def test_module_docstring_mentioning_class_keeps_the_file(self):
+        content = '"""Generic socket server classes.\n\nclass BaseServer:\n"""\nimport os\n\nclass A:\n    def m(self):\n        return 1\n\nclass B(A):\n    pass'
+        result = process_content_skeleton(content, True)
+        self.assertIn('class A:\n    def m(self):\n        ...\n', result)
+        self.assertTrue(result.endswith('class B(A):\n    pass'))
+
+    def test_triple_quote_inside_string_opens_nothing(self):
+        content = 'def f(line):\n    if (line[:3] == \'"""\') or line[:3] == "\'\'\'":\n        return 1\n\ndef g(x):\n    return x\nX = \'"""\'  # """\nclass C:\n    pass'
+        expected = 'def f(line):\n    ...\ndef g(x):\n    ...\nX = \'"""\'  # """\nclass C:\n    pass'
+        self.assertEqual(process_content_skeleton(content, True, ('comments',)), expected)
+
+    def test_engine_and_flag(self):
+        self.assertIs(get_engine('skeleton'), process_content_skeleton)
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'm.py')
+            out = os.path.join(tmp, 'out.txt')
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write(self.content)
+            main([path, '--skeleton', '--no_cache', '--output', out])
+            with open(out, encoding='utf-8') as f:
+                self.assertIn('def g(x): ...\n', f.read())
+
+
+class TestRules(unittest.TestCase):
+
+    content = '''import os
+def f(x):
+    print(
+        x,
+    )
+    assert x > 0, "positive"
+    logger.info(x)  # log
+    return x'''
+
+    def test_extra_rules(self):
+        rules = DEFAULT_RULES + ('print', 'assert')
+        expected = "# Imports omitted for brevity...\ndef f(x):\n    return x"
+        self.assertEqual(process_content(self.content, True, rules), expected)
+        self.assertEqual(process_content_tokenize(self.content, True, rules), expected)
+
+    def test_rule_subset(self):
+        rules = parse_rules('logger, print')
+        expected = "import os\ndef f(x):\n    assert x > 0, \"positive\"\n    return x"
+        self.assertEqual(process_content(self.content, True, rules), expected)
+        self.assertEqual(process_content_tokenize(self.content, True, rules), expected)
+
+    def test_unknown_rule(self):
+        with self.assertRaises(ValueError):
+            parse_rules('imports,nope')
+
+
+class TestProcessFiles(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        for name in ('b.py', 'a.py', 'sub/c.py', 'sub/d.txt'):
+            path = os.path.join(self.tmp.name, name)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write(f"import os\nx = 1  # comment\nname = '{name}'\n")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_parallel_matches_serial_order(self):
+        paths = list(iter_directory_files(self.tmp.name))
+        serial = list(process_files(paths, True, jobs=1))
+        parallel = list(process_files(paths, True, jobs=2))
+        self.assertEqual(serial, parallel)
+        self.assertEqual([p for p, _ in serial], paths)
+
+    def test_prefetch_matches_serial(self):
+        paths = list(iter_directory_files(self.tmp.name))
+        serial = list(process_files(paths, True, jobs=1))
+        prefetched = list(process_files(paths, True, jobs=1, prefetch=2))
+        self.assertEqual(serial, prefetched)
+
+    def test_read_ahead_window(self):
+        from prefetch import read_ahead
+        paths = list(iter_directory_files(self.tmp.name))
+        sizes = {path: 10 for path in paths}
+        sizes[paths[0]], sizes[paths[1]] = 20, 1000
+        pulled = []
+        gen = read_ahead((pulled.append(path) or path for path in paths), 2, sizes, max_bytes=15, skip_above=100)
+        first_path, first = next(gen)
+        # The first read alone exceeds the byte budget, so nothing more is queued.
+        self.assertEqual(pulled, paths[:1])
+        self.assertEqual(first.result(), Path(first_path).read_bytes())
+        second_path, second = next(gen)
+        self.assertEqual(second_path, paths[1])
+        self.assertIsNone(second)
+        gen.close()
+        self.assertLessEqual(len(pulled), 4)
+
+    def test_parallel_close_early(self):
+        from concurrent.futures import ThreadPoolExecutor
+        from copy_files import size_batches
+        paths = list(iter_directory_files(self.tmp.name)) * 50
+        batches = size_batches(paths, None, 2)
+        calls = []
+        gate = threading.Event()
+
+        def process(file_path, *args, **kwargs):
+            calls.append(file_path)
+            # Hold the single worker inside the second batch until the run is closed.
+            if len(calls) > len(batches[0]):
+                gate.wait(5)
+            return file_path
+
+        with mock.patch('copy_files.process_file', process), ThreadPoolExecutor(max_workers=1) as executor:
+            results = process_files(paths, True, jobs=2, executor=executor)
+            self.assertEqual(next(results)[0], paths[0])
+            results.close()
+            gate.set()
+        # The batch the worker was in may finish, but the batches still queued never run.
+        self.assertGreater(len(batches), 2)
+        self.assertLessEqual(len(calls), len(batches[0]) + len(batches[1]))
+
+    def test_gui_selection_cancel_during_scan(self):
+        import queue
+        import gui2
+        entries = list(scan(self.tmp.name, Filters()))
+        cancel_event = threading.Event()
+        pulled = []
+
+        def iter_entries(*args):
+            for entry in entries:
+                pulled.append(entry)
+                cancel_event.set()
+                yield entry
+
+        app = mock.Mock(progress_updates=queue.Queue())
+        with mock.patch('gui2.iter_directory_entries', iter_entries), mock.patch('gui2.process_files') as process:
+            gui2.FileProcessorApp.process_selection(app, [self.tmp.name], None, None, None, None, True, cancel_event)
+        self.assertEqual(len(pulled), 1)
+        self.assertEqual(app.progress_updates.get_nowait(), ("done", None))
+        process.assert_not_called()
+
+    def test_size_batches_are_contiguous_and_shrink(self):
+        from copy_files import size_batches
+        paths = [f"f{i}" for i in range(200)]
+        sizes = {path: 100000 for path in paths}
+        batches = size_batches(paths, sizes, 4)
+        self.assertEqual([path for batch in batches for path in batch], paths)
+        self.assertGreater(len(batches[0]), len(batches[-1]))
+        self.assertTrue(all(len(batch) <= 64 for batch in batches))
+        big = size_batches(['a', 'huge', 'b', 'c'], {'huge': 10 ** 9}, 2)
+        self.assertEqual(big[0], ['a', 'huge'])
+
+    def test_multiple_sources_and_file_list(self):
+        from inputs import read_file_list
+        list_path = os.path.join(self.tmp.name, 'list')
+        a_py = os.path.join(self.tmp.name, 'a.py')
+        d_txt = os.path.join(self.tmp.name, 'sub', 'd.txt')
+        c_py = os.path.join(self.tmp.name, 'sub', 'c.py')
+        with open(list_path, 'wb') as f:
+            f.write(b'\0'.join(p.encode() for p in (d_txt, c_py, a_py, os.path.join(self.tmp.name, 'missing.py'))))
+        self.assertEqual(read_file_list(list_path)[:3], [d_txt, c_py, a_py])
+        out = os.path.join(self.tmp.name, 'out.txt')
+        cwd = os.getcwd()
+        os.chdir(self.tmp.name)
+        self.addCleanup(os.chdir, cwd)
+        main([a_py, os.path.join(self.tmp.name, 'sub', '*.py'), os.path.join(self.tmp.name, 'sub', '..', 'a.py'),
+              '--files_from', list_path, '--include_ext', '.py', '--no_cache', '--jobs', '2', '--output', out])
+        with open(out, encoding='utf-8') as f:
+            headers = [line[len('# File: '):] for line in f.read().splitlines() if line.startswith('# File: ')]
+        self.assertEqual(headers, [a_py, c_py])
+
+    def test_file_list_with_absolute_paths(self):
+        outside = tempfile.TemporaryDirectory()
+        self.addCleanup(outside.cleanup)
+        elsewhere = os.path.join(outside.name, 'e.txt')
+        with open(elsewhere, 'w', encoding='utf-8') as f:
+            f.write('e\n')
+        list_path = os.path.join(self.tmp.name, 'list')
+        with open(list_path, 'w', encoding='utf-8') as f:
+            f.write('\n'.join(os.path.join(self.tmp.name, name) for name in ('sub/c.py', 'sub/d.txt', 'b.py')))
+            f.write(f'\n{elsewhere}\n')
+        out = os.path.join(self.tmp.name, 'out.txt')
+        cwd = os.getcwd()
+        os.chdir(self.tmp.name)
+        self.addCleanup(os.chdir, cwd)
+        main(['--files_from', list_path, '--include_dirs', 'sub', '--include_ext', '.py', '--no_cache', '--output', out])
+        with open(out, encoding='utf-8') as f:
+            headers = [line[len('# File: '):] for line in f.read().splitlines() if line.startswith('# File: ')]
+        # Ancestors of the working directory are not filtered; files outside it are taken as given.
+        self.assertEqual(headers, [os.path.join(self.tmp.name, 'sub', 'c.py'), os.path.join(self.tmp.name, 'b.py'), elsewhere])
+
+    def test_single_glob_source(self):
+        out = os.path.join(self.tmp.name, 'out.txt')
+        main([os.path.join(self.tmp.name, 'sub', '*.py'), '--no_cache', '--output', out])
+        with open(out, encoding='utf-8') as f:
+            self.assertTrue(f.read().startswith(f"# File: {os.path.join(self.tmp.name, 'sub', 'c.py')}\n"))
+        with mock.patch('sys.stderr', new_callable=io.StringIO) as stderr:
+            main([os.path.join(self.tmp.name, 'none', '*.py'), '--no_cache', '--output', out])
+        self.assertIn('No files match', stderr.getvalue())
+        with mock.patch('sys.stderr', new_callable=io.StringIO), self.assertRaises(SystemExit):
+            main([os.path.join(self.tmp.name, 'missing'), '--output', out])
+
+    def test_file_header(self):
+        path = os.path.join(self.tmp.name, 'a.py')
+        [(_, chunk)] = process_files([path], True)
+        self.assertEqual(chunk, f"# File: {path}\n# Imports omitted for brevity...\nx = 1\nname = 'a.py'\n\n")
+
+    def test_output_to_file(self):
+        out = os.path.join(self.tmp.name, 'dump.txt')
+        copy_directory_to_clipboard(self.tmp.name, include_ext=['.py'], modify_python=True, output=out)
+        paths = list(iter_directory_files(self.tmp.name, include_ext=['.py']))
+        expected = "".join(chunk for _, chunk in process_files(paths, True))
+        with open(out, encoding='utf-8') as f:
+            self.assertEqual(f.read(), expected)
+
+    def test_output_to_gzip(self):
+        out = os.path.join(self.tmp.name, 'dump.txt.gz')
+        copy_directory_to_clipboard(self.tmp.name, include_ext=['.txt'], output=out)
+        with gzip.open(out, 'rt', encoding='utf-8') as f:
+            self.assertTrue(f.read().startswith(f"# File: {os.path.join(self.tmp.name, 'sub', 'd.txt')}\n"))
+
+    def test_comment_stripping_for_other_languages(self):
+        cases = {
+            'app.ts': ("/// <reference path='x' />\n// note\nconst a = '//'; // kept\n\n/* block\n */\nlet b = 1;\n",
+                       "/// <reference path='x' />\nconst a = '//'; // kept\nlet b = 1;"),
+            'main.go': ("//go:build linux\n\n// Package main.\npackage main\n", "//go:build linux\npackage main"),
+            'run.sh': ("#!/bin/sh\n# comment\n\necho '#'\n", "#!/bin/sh\necho '#'"),
+            'conf.yaml': ("# top\nkey: value  # trailing\n\n  # nested\nother: 1\n", "key: value  # trailing\nother: 1"),
+            'tpl.js': ("const q = `\n// text\n\n`;\n// gone\n", "const q = `\n// text\n\n`;"),
+            'here.sh': ("cat <<-'EOF'\n\t# text\n\tEOF\n# gone\necho \"a\n# text\"\n", "cat <<-'EOF'\n\t# text\n\tEOF\necho \"a\n# text\""),
+            'block.yml': ("run: |\n  # text\n\n  make\n# gone\nname: it's\n", "run: |\n  # text\n\n  make\nname: it's"),
+        }
+        rules = DEFAULT_RULES + ('other_comments',)
+        for name, (content, expected) in cases.items():
+            path = os.path.join(self.tmp.name, name)
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write(content)
+            self.assertEqual(process_file(path, True, rules=rules), f"# File: {path}\n{expected}\n\n")
+            self.assertEqual(process_file(path, False, rules=rules), f"# File: {path}\n{content}\n\n")
+            self.assertEqual(process_file(path, True), f"# File: {path}\n{content}\n\n")
+
+    def test_archive_output(self):
+        from archive import Archive
+        flat = os.path.join(self.tmp.name, 'dump.txt')
+        out = os.path.join(self.tmp.name, 'dump.cfa')
+        copy_directory_to_clipboard(self.tmp.name, include_ext=['.py'], modify_python=True, output=flat)
+        copy_directory_to_clipboard(self.tmp.name, include_ext=['.py'], modify_python=True, output=out)
+        with open(flat, encoding='utf-8') as f, gzip.open(out, 'rt', encoding='utf-8') as g:
+            self.assertEqual(g.read(), f.read())
+        c_py = os.path.join(self.tmp.name, 'sub', 'c.py')
+        with Archive(out) as archive:
+            self.assertEqual(archive.read(c_py), process_file(c_py, True))
+            old = Archive(out)
+
+        with open(os.path.join(self.tmp.name, 'a.py'), 'a', encoding='utf-8') as f:
+            f.write("y = 2\n")
+        processed = []
+        real = process_file
+
+        def spy(file_path, *args, **kwargs):
+            processed.append(file_path)
+            return real(file_path, *args, **kwargs)
+
+        with mock.patch('copy_files.process_file', spy):
+            copy_directory_to_clipboard(self.tmp.name, include_ext=['.py'], modify_python=True, output=out)
+        self.assertEqual(processed, [os.path.join(self.tmp.name, 'a.py')])
+        with Archive(out) as archive:
+            self.assertIn("y = 2\n", archive.read(os.path.join(self.tmp.name, 'a.py')))
+            self.assertEqual(archive.read(c_py), process_file(c_py, True))
+            self.assertEqual(archive.diff(old), ([], [], [os.path.join(self.tmp.name, 'a.py')]))
+        old.close()
+
+    def test_pipe_clipboard_streams_chunks(self):
+        out = os.path.join(self.tmp.name, 'clip.txt')
+        script = f"import sys; open({out!r}, 'wb').write(sys.stdin.buffer.read())"
+        with PipeClipboardSink([sys.executable, '-c', script]) as sink:
+            for piece in ('a', 'é', 'c\n'):
+                sink.write(piece)
+        with open(out, encoding='utf-8') as f:
+            self.assertEqual(f.read(), 'aéc\n')
+
+    def test_clipboard_limit_spills_to_fallback(self):
+        fallback = os.path.join(self.tmp.name, 'fallback.txt')
+        with LimitedClipboardSink(NullSink(), 5, fallback) as sink:
+            sink.write('abc')
+            sink.write('def')
+            sink.write('g')
+        self.assertIn(fallback, sink.message)
+        with open(fallback, encoding='utf-8') as f:
+            self.assertEqual(f.read(), 'abcdefg')
+
+        clipboard = NullSink()
+        with LimitedClipboardSink(clipboard, 5, fallback) as sink:
+            sink.write('abc')
+        self.assertEqual(clipboard.size, 3)
+        self.assertIsInstance(clipboard_sink('none'), NullSink)
+
+    def test_copier_reuses_pool_and_index(self):
+        out = os.path.join(self.tmp.name, 'dump.txt')
+        copy_directory_to_clipboard(self.tmp.name, include_ext=['.py'], modify_python=True, output=out)
+        with open(out, encoding='utf-8') as f:
+            expected = f.read()
+        with Copier(include_ext=['.py'], jobs=2, watch=True) as copier:
+            self.assertEqual(copier.render(self.tmp.name), expected)
+            pool = copier.executor
+            with open(os.path.join(self.tmp.name, 'z.py'), 'w', encoding='utf-8') as f:
+                f.write('z = 1\n')
+            copier.indexes[os.path.abspath(self.tmp.name)].refresh_dir(self.tmp.name)
+            self.assertIn(f"# File: {os.path.join(self.tmp.name, 'z.py')}\nz = 1\n\n", copier.render(self.tmp.name))
+            self.assertIs(copier.executor, pool)
+
+    def test_copier_watch_indexes_only_filtered_tree(self):
+        os.makedirs(os.path.join(self.tmp.name, 'node_modules', 'pkg'))
+        with open(os.path.join(self.tmp.name, 'node_modules', 'pkg', 'x.py'), 'w', encoding='utf-8') as f:
+            f.write('x = 1\n')
+        with Copier(exclude_dirs=['node_modules'], watch=True) as copier:
+            rendered = copier.render(self.tmp.name)
+            index = copier.indexes[os.path.abspath(self.tmp.name)]
+            self.assertNotIn(os.path.join(self.tmp.name, 'node_modules'), index.dir_ids)
+            self.assertIn(os.path.join(self.tmp.name, 'sub'), index.dir_ids)
+            os.makedirs(os.path.join(self.tmp.name, 'sub', 'node_modules'))
+            index.refresh_dir(os.path.join(self.tmp.name, 'sub'))
+            self.assertNotIn(os.path.join(self.tmp.name, 'sub', 'node_modules'), index.dir_ids)
+        self.assertNotIn('node_modules', rendered)
+        self.assertIn('d.txt', rendered)
+
+    def test_daemon_round_trip(self):
+        import threading
+        from daemon import request, serve
+        socket_path = os.path.join(self.tmp.name, 'copy_files.sock')
+        server = threading.Thread(target=serve, args=(Copier(include_ext=['.txt']), socket_path))
+        server.start()
+        try:
+            for _ in range(100):
+                if os.path.exists(socket_path):
+                    break
+                time.sleep(0.01)
+            status, body = request(self.tmp.name, '-', socket_path)
+            self.assertTrue(status['ok'])
+            self.assertEqual(body.decode('utf-8'), process_file(os.path.join(self.tmp.name, 'sub', 'd.txt'), True))
+            status, _ = request(os.path.join(self.tmp.name, 'missing'), '-', socket_path)
+            self.assertFalse(status['ok'])
+        finally:
+            request(None, socket_path=socket_path, command='shutdown')
+            server.join()
+
+    def test_single_file_fast_path(self):
+        path = os.path.join(self.tmp.name, 'a.py')
+        out = os.path.join(self.tmp.name, 'dump.txt')
+        self.assertEqual(single_file_args([path, '--output', out]), (path, out))
+        self.assertEqual(single_file_args([path, f'--output={out}']), (path, out))
+        self.assertIsNone(single_file_args([self.tmp.name]))
+        self.assertIsNone(single_file_args([path, '--engine', 'tokenize']))
+        with mock.patch('argparse.ArgumentParser', side_effect=AssertionError):
+            main([path, '--output', out])
+        with open(out, encoding='utf-8') as f:
+            self.assertEqual(f.read(), process_file(path, True))
+
+    def test_stats_hooks(self):
+        hooks = Hooks()
+        events = []
+        hooks.subscribe('stage', lambda name, seconds, nbytes: events.append(name))
+        hooks.subscribe('file', lambda path, read, transform, nbytes: events.append(os.path.basename(path)))
+        stats = Stats(hooks, top=2)
+        for jobs in (1, 2):
+            del events[:]
+            copy_to_clipboard(self.tmp.name, include_ext=['.py'], modify_python=True, jobs=jobs,
+                              output=os.path.join(self.tmp.name, 'dump.txt'), hooks=hooks)
+            self.assertEqual(sorted(events), ['a.py', 'b.py', 'c.py', 'emit', 'output', 'scan'])
+        report = stats.report()
+        self.assertIn('transform', report)
+        self.assertIn('slowest 2 files:', report)
+
+    def test_profile_writes_file(self):
+        out = os.path.join(self.tmp.name, 'dump.txt')
+        for mode in ('cprofile', 'tracemalloc'):
+            profile = os.path.join(self.tmp.name, f'{mode}.out')
+            run_profiled(mode, profile, copy_to_clipboard, self.tmp.name, ['.py'], None, None, None, True, 1, out)
+            self.assertGreater(os.path.getsize(profile), 0)
+
+    def test_binary_and_unreadable_files_do_not_abort_dump(self):
+        png = os.path.join(self.tmp.name, 'logo.png')
+        with open(png, 'wb') as f:
+            f.write(b'\x89PNG\r\n\x1a\n' + bytes(range(256)) * 1000)
+        latin = os.path.join(self.tmp.name, 'latin.txt')
+        with open(latin, 'wb') as f:
+            f.write('caf\xe9\n'.encode('latin-1'))
+        missing = os.path.join(self.tmp.name, 'gone.txt')
+        chunks = dict(process_files([png, latin, missing], False))
+        self.assertEqual(chunks[png], f"# File: {png}\n# Skipped: PNG image, {8 + 256 * 1000} bytes\n\n")
+        self.assertEqual(chunks[latin], f"# File: {latin}\ncaf\xe9\n\n\n")
+        self.assertTrue(chunks[missing].startswith(f"# File: {missing}\n# Error: "))
+
+    def test_binary_file_is_only_sniffed(self):
+        from sniff import SNIFF_BYTES
+        path = os.path.join(self.tmp.name, 'blob.bin')
+        with open(path, 'wb') as f:
+            f.write(b'\0' * (SNIFF_BYTES * 10))
+        reads = []
+        real_open = open
+
+        class Recording:
+            def __init__(self, f):
+                self.f = f
+
+            def __enter__(self):
+                return self
+
+            def __exit__(self, *exc):
+                self.f.close()
+
+            def read(self, size=-1):
+                data = self.f.read(size)
+                reads.append(len(data))
+                return data
+
+            def fileno(self):
+                return self.f.fileno()
+
+        with mock.patch('builtins.open', lambda *args, **kwargs: Recording(real_open(*args, **kwargs))):
+            chunk = process_file(path, False, large_files=LargeFilePolicy(SNIFF_BYTES))
+        self.assertEqual(chunk, f"# File: {path}\n# Skipped: binary data, {SNIFF_BYTES * 10} bytes\n\n")
+        self.assertEqual(sum(reads), SNIFF_BYTES)
+
+    def test_dedup_references_identical_files(self):
+        from dedup import Deduplicator
+        shutil.copy(os.path.join(self.tmp.name, 'a.py'), os.path.join(self.tmp.name, 'sub', 'e.py'))
+        out = os.path.join(self.tmp.name, 'out.txt')
+        dedup = Deduplicator()
+        processed = []
+        real = process_file
+
+        def spy(file_path, *args, **kwargs):
+            processed.append(file_path)
+            return real(file_path, *args, **kwargs)
+
+        with mock.patch('copy_files.process_file', spy):
+            copy_directory_to_clipboard(self.tmp.name, include_ext=['.py'], output=out, dedup=dedup)
+        copy_path = os.path.join(self.tmp.name, 'sub', 'e.py')
+        original = os.path.join(self.tmp.name, 'a.py')
+        self.assertNotIn(copy_path, processed)
+        self.assertEqual(dedup.duplicates, 1)
+        with open(out, encoding='utf-8') as f:
+            dump = f.read()
+        note = f"# File: {copy_path} (identical to {original})\n\n"
+        self.assertIn(note, dump)
+        self.assertLess(dump.index(f"# File: {original}\n"), dump.index(note))
+
+    def test_budget_skips_files_that_do_not_fit(self):
+        with open(os.path.join(self.tmp.name, 'big.txt'), 'w', encoding='utf-8') as f:
+            f.write('x' * 10000)
+        entries = prioritize(list(scan(self.tmp.name)), 'size')
+        self.assertEqual(entries[-1].name, 'big.txt')
+        budget = Budget(max_bytes=2000)
+        read = []
+        with mock.patch('copy_files.process_file', side_effect=lambda p, *a: read.append(p) or f"# File: {p}\n\n\n"):
+            chunks = list(budget.admit(process_files(budget.gate(entries), False)))
+        self.assertNotIn(os.path.join(self.tmp.name, 'big.txt'), read)
+        self.assertEqual(len(read), 4)
+        self.assertIsNone(chunks[-1][0])
+        self.assertIn("1 files omitted", chunks[-1][1])
+        self.assertIn("big.txt (10000 bytes)", chunks[-1][1])
+
+    def test_budget_independent_of_read_ahead(self):
+        src = os.path.join(self.tmp.name, 'many')
+        os.makedirs(src)
+        for i in range(20):
+            with open(os.path.join(src, f'm{i:02}.py'), 'w', encoding='utf-8') as f:
+                f.write(f'import os\n\n\ndef f{i}():\n    """\n    {"Long docstring. " * 20}\n    """\n    return {i}\n')
+        dumps = []
+        for extra in ([], ['--jobs', '2'], ['--prefetch', '4']):
+            out = os.path.join(self.tmp.name, f'out{len(dumps)}.txt')
+            main([src, '--max_bytes', '3000', '--no_cache', '--output', out] + extra)
+            with open(out, encoding='utf-8') as f:
+                dumps.append(f.read())
+        self.assertEqual(dumps[1], dumps[0])
+        self.assertEqual(dumps[2], dumps[0])
+        self.assertGreater(dumps[0].count('# File: '), 10)
+
+    def test_budget_in_tokens(self):
+        budget = Budget(max_tokens=100)
+        self.assertEqual(budget.limit, 400)
+        out = os.path.join(self.tmp.name, 'out.txt')
+        copy_directory_to_clipboard(self.tmp.name, include_ext=['.py'], output=out, budget=Budget(max_tokens=40), priority='depth')
+        with open(out, encoding='utf-8') as f:
+            dump = f.read()
+        self.assertLessEqual(len(dump.split('# Budget:')[0]), 160)
+        self.assertIn("files omitted", dump)
+
+    def test_since_last_manifest(self):
+        manifest_path = os.path.join(self.tmp.name, 'state', 'manifest.json')
+        out = os.path.join(self.tmp.name, 'out.txt')
+
+        def dump():
+            copy_directory_to_clipboard(self.tmp.name, include_ext=['.py'], output=out,
+                                        manifest=Manifest(self.tmp.name, manifest_path))
+            with open(out, encoding='utf-8') as f:
+                return f.read().count('# File: ')
+
+        self.assertEqual(dump(), 3)
+        self.assertEqual(dump(), 0)
+        with open(os.path.join(self.tmp.name, 'a.py'), 'a', encoding='utf-8') as f:
+            f.write("y = 2\n")
+        self.assertEqual(dump(), 1)
+
+    @unittest.skipUnless(shutil.which('git'), "git is not installed")
+    def test_since_git_ref(self):
+        def git(*args):
+            subprocess.run(['git', '-c', 'user.name=t', '-c', 'user.email=t@t', *args], cwd=self.tmp.name,
+                           check=True, capture_output=True)
+
+        git('init', '-q')
+        git('add', '-A')
+        git('commit', '-q', '-m', 'init')
+        with open(os.path.join(self.tmp.name, 'sub', 'c.py'), 'a', encoding='utf-8') as f:
+            f.write("y = 2\n")
+        with open(os.path.join(self.tmp.name, 'new.py'), 'w', encoding='utf-8') as f:
+            f.write("z = 3\n")
+        os.remove(os.path.join(self.tmp.name, 'b.py'))
+
+        entries = git_changed_entries(self.tmp.name, 'HEAD', Filters(include_ext=['.py']))
+        self.assertEqual([os.path.relpath(e.path, self.tmp.name) for e in entries], ['new.py', 'sub/c.py'])
+
+    def test_since_bad_ref_is_a_usage_error(self):
+        out = os.path.join(self.tmp.name, 'out.txt')
+        with mock.patch('sys.stderr', new_callable=io.StringIO) as stderr, self.assertRaises(SystemExit):
+            main([self.tmp.name, '--since', 'HEAD', '--output', out])
+        self.assertIn('not in one', stderr.getvalue())
+        subprocess.run(['git', 'init', '-q'], cwd=self.tmp.name, check=True)
+        with mock.patch('sys.stderr', new_callable=io.StringIO) as stderr, self.assertRaises(SystemExit):
+            main([self.tmp.name, '--since', 'no-such-ref', '--output', out])
+        self.assertIn("unknown git revision 'no-such-ref'", stderr.getvalue())
+        self.assertFalse(os.path.exists(out))
+
+
+class TestLargeFiles(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, 'big.py')
+        body = "def f():\n    \"\"\"\n    Doc.\n    \"\"\"\n    logger.info(\n        'x',\n    )\n    return 1  # one\n"
+        with open(self.path, 'w', encoding='utf-8', newline='') as f:
+            f.write("import os\r\n" + body * 2000)
+        self.size = os.path.getsize(self.path)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_stream_matches_in_memory(self):
+        chunk = process_file(self.path, True, large_files=LargeFilePolicy(1024, 'stream'))
+        self.assertIsInstance(chunk, StreamedChunk)
+        self.assertEqual("".join(chunk), process_file(self.path, True))
+        self.assertGreaterEqual(chunk.size, len("".join(chunk)))
+
+    def test_stream_matches_in_memory_for_any_text(self):
+        cases = {
+            'plain.txt': 'a\r\nb\rc\n\n\n'.encode('utf-8'),
+            'bom.txt': codecs.BOM_UTF8 + 'caf\u00e9\nx\n'.encode('utf-8'),
+            'wide.txt': 'caf\u00e9\r\nline\n'.encode('utf-16'),
+            'latin.txt': 'ok\n'.encode('utf-8') * 200 + 'caf\u00e9\n'.encode('latin-1'),
+            'no_newline.txt': b'last line',
+            'app.js': 'const q = `\n// text\n\n`;\n// gone\n/* a\n b */\nlet x = 1;\n\n'.encode('utf-8'),
+        }
+        policy = LargeFilePolicy(1, 'stream')
+        rules = DEFAULT_RULES + ('other_comments',)
+        for name, data in cases.items():
+            path = os.path.join(self.tmp.name, name)
+            with open(path, 'wb') as f:
+                f.write(data)
+            for modify in (True, False):
+                chunk = process_file(path, modify, rules=rules, large_files=policy)
+                self.assertIsInstance(chunk, StreamedChunk)
+                self.assertEqual("".join(chunk), process_file(path, modify, rules=rules), (name, modify))
+
+    def test_small_files_are_not_streamed(self):
+        chunk = process_file(self.path, True, large_files=LargeFilePolicy(self.size, 'stream'))
+        self.assertIsInstance(chunk, str)
+
+    def test_truncate_keeps_head_and_tail(self):
+        chunk = process_file(self.path, False, large_files=LargeFilePolicy(1000, 'truncate'))
+        self.assertTrue(chunk.startswith(f"# File: {self.path}\nimport os\n"))
+        self.assertIn("bytes omitted ...", chunk)
+        self.assertTrue(chunk.endswith("    return 1  # one\n\n\n"))
+        self.assertLess(len(chunk), 1200)
+
+    def test_skip(self):
+        chunk = process_file(self.path, True, large_files=LargeFilePolicy(1000, 'skip'))
+        self.assertEqual(chunk, f"# File: {self.path}\n# Skipped: {self.size} bytes is over the 1000 byte limit\n\n")
+
+    def test_streamed_chunk_written_to_file(self):
+        out = os.path.join(self.tmp.name, 'out.txt')
+        copy_directory_to_clipboard(self.tmp.name, include_ext=['.py'], modify_python=True, output=out,
+                                    jobs=2, large_files=LargeFilePolicy(1024, 'stream'))
+        with open(out, encoding='utf-8') as f:
+            self.assertEqual(f.read(), process_file(self.path, True))
+
+
+class TestContentCache(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.cache = ContentCache(os.path.join(self.tmp.name, 'cache', 'cache.sqlite3'))
+        self.path = os.path.join(self.tmp.name, 'a.py')
+        with open(self.path, 'w', encoding='utf-8') as f:
+            f.write("import os\nx = 1\n")
+        self.calls = 0
+
+    def tearDown(self):
+        self.cache.close()
+        self.tmp.cleanup()
+
+    def transform(self, data):
+        self.calls += 1
+        return data.decode('utf-8').upper()
+
+    def test_warm_hit_skips_transform(self):
+        self.assertEqual(self.cache.get(self.path, 'v', self.transform), "IMPORT OS\nX = 1\n")
+        self.assertEqual(self.cache.get(self.path, 'v', self.transform), "IMPORT OS\nX = 1\n")
+        self.assertEqual(self.calls, 1)
+
+    def test_touched_file_reuses_digest(self):
+        self.cache.get(self.path, 'v', self.transform)
+        st = os.stat(self.path)
+        os.utime(self.path, ns=(st.st_atime_ns, st.st_mtime_ns + 10 ** 9))
+        self.cache.get(self.path, 'v', self.transform)
+        self.assertEqual(self.calls, 1)
+
+    def test_changed_file_and_variant_miss(self):
+        self.cache.get(self.path, 'v', self.transform)
+        self.cache.get(self.path, 'other', self.transform)
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.write("y = 2\n")
+        self.assertEqual(self.cache.get(self.path, 'v', self.transform), "IMPORT OS\nX = 1\nY = 2\n")
+        self.assertEqual(self.calls, 3)
+
+    def test_evict_to_size_limit(self):
+        self.cache.max_bytes = 0
+        self.cache.get(self.path, 'v', self.transform)
+        self.cache.evict()
+        self.cache.get(self.path, 'v', self.transform)
+        self.assertEqual(self.calls, 2)
+
+    def test_raw_entries_from_before_transform_version_miss(self):
+        path = os.path.join(self.tmp.name, 'bom.txt')
+        with open(path, 'wb') as f:
+            f.write(b'\xef\xbb\xbfhello\n')
+        # What an older version stored under the unversioned 'raw' variant.
+        self.cache.get(path, 'raw', lambda data: data.decode('utf-8'))
+        self.assertEqual(process_file(path, True, cache=self.cache), process_file(path, True))
+        self.assertNotIn('\ufeff', process_file(path, True, cache=self.cache))
+
+    def test_prefetch_skips_cached_files(self):
+        import prefetch
+        paths = [self.path, os.path.join(self.tmp.name, 'b.txt')]
+        with open(paths[1], 'w', encoding='utf-8') as f:
+            f.write('b\n')
+        cold = list(process_files(paths, True, cache=self.cache))
+        reads = []
+
+        def read_text(file_path):
+            reads.append(file_path)
+            return real(file_path)
+
+        real = prefetch.read_text
+        with mock.patch('prefetch.read_text', read_text):
+            self.assertEqual(list(process_files(paths, True, cache=self.cache, prefetch=4)), cold)
+            self.assertEqual(reads, [])
+            with open(paths[1], 'a', encoding='utf-8') as f:
+                f.write('c\n')
+            list(process_files(paths, True, cache=self.cache, prefetch=4))
+        self.assertEqual(reads, [paths[1]])
+
+    def test_prefetch_looks_cached_files_up_once(self):
+        paths = [self.path, os.path.join(self.tmp.name, 'b.txt')]
+        with open(paths[1], 'w', encoding='utf-8') as f:
+            f.write('b\n')
+        policy = LargeFilePolicy(1024 * 1024)
+        cold = list(process_files(paths, True, cache=self.cache, large_files=policy))
+        with mock.patch.object(self.cache, 'lookup', wraps=self.cache.lookup) as lookup, \
+                mock.patch.object(self.cache, 'get', wraps=self.cache.get) as get, \
+                mock.patch('os.stat', wraps=os.stat) as stat:
+            self.assertEqual(list(process_files(paths, True, cache=self.cache, large_files=policy, prefetch=4)), cold)
+        self.assertEqual(lookup.call_count, 2)
+        self.assertEqual(get.call_count, 0)
+        self.assertEqual(stat.call_count, 2)
+
+    def test_parallel_with_cache(self):
+        serial = list(process_files([self.path], True))
+        self.assertEqual(list(process_files([self.path] * 3, True, jobs=2, cache=self.cache)), serial * 3)
+        self.assertEqual(list(process_files([self.path], True, cache=self.cache)), serial)
+
+
+class TestScanner(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        for name in ('a.py', 'b.js', 'b.min.js', 'src/c.py', 'src/deep/d.py', 'build/e.py', 'node_modules/f.js'):
+            path = os.path.join(self.tmp.name, name)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write(name)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def relpaths(self, filters=None):
+        return sorted(os.path.relpath(e.path, self.tmp.name) for e in scan(self.tmp.name, filters))
+
+    def test_matches_os_walk_order(self):
+        expected = [str(Path(root) / f) for root, _, files in os.walk(self.tmp.name) for f in files]
+        entries = list(scan(self.tmp.name))
+        self.assertEqual([e.path for e in entries], expected)
+        self.assertEqual(entries[0].size, os.path.getsize(entries[0].path))
+
+    def test_extension_and_dir_filters(self):
+        filters = Filters(include_ext=['.py'], exclude_dirs=['build'])
+        self.assertEqual(self.relpaths(filters), ['a.py', 'src/c.py', 'src/deep/d.py'])
+
+    def test_globs(self):
+        filters = Filters(exclude_globs=['*.min.js', 'node_modules', 'src/deep'])
+        self.assertEqual(self.relpaths(filters), ['a.py', 'b.js', 'build/e.py', 'src/c.py'])
+        filters = Filters(include_globs=['src/*.py'])
+        self.assertEqual(self.relpaths(filters), ['src/c.py', 'src/deep/d.py'])
+
+    def test_gitignore(self):
+        os.makedirs(os.path.join(self.tmp.name, '.git', 'info'))
+        with open(os.path.join(self.tmp.name, '.git', 'info', 'exclude'), 'w') as f:
+            f.write("b.js\n")
+        with open(os.path.join(self.tmp.name, '.gitignore'), 'w') as f:
+            f.write("# deps\nnode_modules/\n/build\n*.js\n!b.min.js\n")
+        with open(os.path.join(self.tmp.name, 'src', '.gitignore'), 'w') as f:
+            f.write("deep/\n")
+        filters = IgnoreFilters(self.tmp.name, Filters(exclude_globs=['.gitignore']))
+        self.assertEqual(self.relpaths(filters), ['a.py', 'b.min.js', 'src/c.py'])
+
+    def test_suffix_matches_pathlib(self):
+        for name in ('a.py', '.bashrc', 'a.', 'a.tar.gz', '..a', 'noext'):
+            self.assertEqual(suffix(name), Path(name).suffix)
+
+
+class TestFileIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        for name in ('a.py', 'b.js', 'src/c.py', 'src/deep/d.py', 'build/e.py'):
+            path = os.path.join(self.tmp.name, name)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write(name)
+        self.index = FileIndex(self.tmp.name).build()
+
+    def tearDown(self):
+        self.index.close()
+        self.tmp.cleanup()
+
+    def files(self, filters=None):
+        return sorted(e.path for _, _, files in self.index.walk(filters) for e in files)
+
+    def test_matches_scan(self):
+        for filters in (None, Filters(include_ext=['.py'], exclude_dirs=['build']), Filters(exclude_globs=['src/deep'])):
+            self.assertEqual(self.files(filters), sorted(e.path for e in scan(self.tmp.name, filters)))
 
+    def test_filters_without_disk(self):
+        with mock.patch('os.scandir', side_effect=AssertionError), mock.patch('os.stat', side_effect=AssertionError):
+            self.assertEqual(len(self.files(Filters(include_ext=['.js']))), 1)
 
+    def test_refresh(self):
+        os.remove(os.path.join(self.tmp.name, 'src', 'c.py'))
+        os.makedirs(os.path.join(self.tmp.name, 'src', 'new'))
+        with open(os.path.join(self.tmp.name, 'src', 'new', 'f.py'), 'w') as f:
+            f.write('new')
+        with open(os.path.join(self.tmp.name, 'a.py'), 'w') as f:
+            f.write('longer content')
+        version = self.index.version
+        PollingWatcher(self.index).poll()
+        self.assertGreater(self.index.version, version)
+        self.assertEqual(self.files(), sorted(e.path for e in scan(self.tmp.name)))
+        sizes = {e.name: e.size for _, _, files in self.index.walk() for e in files}
+        self.assertEqual(sizes['a.py'], len('longer content'))
 
 
 if __name__ == '__main__':
@@ -1,164 +1,519 @@
-import argparse
 import os
-import pyperclip
-from pathlib import Path
-
-
-def process_content(content, modify_python):
-    if not modify_python or not content.strip():
-        return content
-
-    new_content = []
-    skip_block_indent = -1
-    imports_found = False
-    is_multiline_import = False
-    in_docstring = False
-    in_definition_docstring = False
-    parenthesis_balance = 0
-    in_logger_statement = False
-    definition_pattern = False
-
-    for line in content.split('\n'):
-        if not line.strip():
-            continue
-
-        if line.startswith("from") or line.startswith("import"):
-            if not imports_found:
-                new_content.append("# Imports omitted for brevity...")
-            imports_found = True
-            if '(' in line and ')' not in line:
-                is_multiline_import = True
-            continue
-
-        if is_multiline_import:
-            if ')' in line:
-                is_multiline_import = False
-            continue
-
-        if line.lstrip().startswith(('def ', 'class ')):
-            definition_pattern = True
-
-        if definition_pattern and '"""' in line:
-            quote_count = line.count('"""')
-            if quote_count % 2 != 0:
-                in_docstring = not in_docstring
-                if in_docstring and definition_pattern:
-                    in_definition_docstring = True
-                if not in_docstring:
-                    definition_pattern = False
-                    if in_definition_docstring:
-                        in_definition_docstring = False
-                        continue
+import sys
+import time
+from functools import partial
+from itertools import islice
+
+from budget import PRIORITIES, Budget, prioritize
+from large_files import BATCH_LINES, DEFAULT_THRESHOLD, LARGE_FILE_MODES, LargeFilePolicy, StreamedChunk, iter_text_lines
+from rules import DEFAULT_RULES, RULES, Rule, applicable_rules, compile_rules, parse_rules
+from scanner import Filters, scan, suffix
+from sniff import BinaryFile, binary_note, decode, read_text, sniff
+from sinks import CLIPBOARD_BACKENDS, DEFAULT_CLIPBOARD_LIMIT, clipboard_sink, open_sink
+from stats import DEFAULT_TOP, PROFILE_MODES, timed_iter
+
+# Bump whenever process_content output changes so cached results are not reused.
+TRANSFORM_VERSION = "2"
+
+
+class LineProcessor:
+    """The line engine behind process_content, usable on a stream of lines.
+
+    feed() may be called repeatedly with successive batches of lines (without
+    their newlines); rule state carries over between batches and the kept
+    lines accumulate in output, which callers may empty between batches.
+    """
+
+    def __init__(self, rules=DEFAULT_RULES):
+        classes, self.top_level, self.indented = compile_rules(tuple(rules))
+        self.output = []
+        self.enabled = [cls(self.output) for cls in classes]
+        self.triggers = {f"r{index}": rule for index, rule in enumerate(self.enabled)}
+        self.transformers = [rule.transform for rule in self.enabled if type(rule).transform is not Rule.transform]
+        self.active = []
+
+    def feed(self, lines):
+        new_content = self.output
+        enabled, triggers, transformers = self.enabled, self.triggers, self.transformers
+        top_level, indented = self.top_level, self.indented
+        active = self.active
+
+        for line in lines:
+            stripped = line.lstrip()
+            if not stripped:
+                continue
+            indent = len(line) - len(stripped)
+
+            triggered = None
+            pattern = (indented if indent else top_level).get(stripped[0])
+            if pattern is not None:
+                match = pattern.match(stripped)
+                if match is not None:
+                    triggered = triggers[match.lastgroup]
+
+            if active or triggered is not None:
+                if triggered is None or triggered in active:
+                    candidates = active
                 else:
+                    candidates = sorted(active + [triggered], key=enabled.index)
+
+                consumed = False
+                for rule in candidates:
+                    if rule is triggered:
+                        consumed = rule.handle(line, indent)
+                    else:
+                        consumed = rule.resume(line, indent)
+                    if consumed:
+                        break
+                active = [rule for rule in candidates if rule.active]
+                if consumed:
                     continue
-            elif in_definition_docstring:
-                continue
-
-        elif in_docstring and in_definition_docstring:
-            continue  # Skip lines within a definition docstring
-
-        if line.lstrip().startswith('except '):
-            skip_block_indent = len(line) - len(line.lstrip())
-            new_content.append(line)
-            new_content.append(f'{" " * skip_block_indent}# Code omitted for brevity...')
-            new_content.append(f'{" " * (skip_block_indent + 1)}pass')
-            continue
-
-        if skip_block_indent != -1:
-            block_indent = len(line) - len(line.lstrip())
-            if block_indent > skip_block_indent:
-                continue
-            skip_block_indent = -1
-
-        if not in_logger_statement and line.lstrip().startswith("logger."):
-            in_logger_statement = True
-            parenthesis_balance += line.count("(") - line.count(")")
-            if parenthesis_balance <= 0:
-                in_logger_statement = False
-            continue
-
-        if in_logger_statement:
-            parenthesis_balance += line.count("(") - line.count(")")
-            if parenthesis_balance <= 0:
-                in_logger_statement = False
-                parenthesis_balance = 0
-                continue
-
-            continue
 
-        comment_index = line.find("#")
-        if comment_index != -1:
-            if not any(map(lambda q: q in line[:comment_index], ('"', "'"))):
-                line = line[:comment_index].rstrip()
+            for transform in transformers:
+                line = transform(line)
                 if not line:
-                    continue
+                    break
+            else:
+                new_content.append(line)
 
-        new_content.append(line)
+        self.active = active
 
-    return '\n'.join(new_content)
 
+def process_content(content, modify_python, rules=DEFAULT_RULES):
+    if not modify_python or not content.strip():
+        return content
 
-def copy_to_clipboard(path, include_ext=None, exclude_ext=None, include_dirs=None, exclude_dirs=None, modify_python=False):
-    if os.path.isdir(path):
-        copy_directory_to_clipboard(path, include_ext, exclude_ext, include_dirs, exclude_dirs, modify_python)
-    elif os.path.isfile(path):
-        copy_file_to_clipboard(path, modify_python)
-
-
-def copy_file_to_clipboard(file_path, modify_python):
-    print(f"Processing: {file_path}")
-    with open(file_path, 'r', encoding='utf-8') as f:
-        content = f.read()
-
-    modified_content = process_content(content, modify_python and Path(file_path).suffix == '.py')
-    clipboard_content = f"# File: {file_path}\n{modified_content}\n\n"
-    pyperclip.copy(clipboard_content)
-    print("File copied to clipboard.")
-
-def copy_files_to_clipboard(files, modify_python=True):
-    clipboard_content = ""
-    for file_path in files:
-        print(f"Processing: {file_path}")
-        with open(file_path, 'r', encoding='utf-8') as f:
-            content = f.read()
-
-        modified_content = process_content(content, modify_python and Path(file_path).suffix == '.py')
-        clipboard_content += f"# File: {file_path}\n{modified_content}\n\n"
-
-    pyperclip.copy(clipboard_content)
-
-def copy_directory_to_clipboard(src, include_ext=None, exclude_ext=None, include_dirs=None, exclude_dirs=None, modify_python=False):
-    clipboard_content = ""
-    for root, dirs, files in os.walk(src):
-        if include_dirs:
-            dirs[:] = [d for d in dirs if d in include_dirs]
-        if exclude_dirs:
-            dirs[:] = [d for d in dirs if d not in exclude_dirs]
-
-        for file in files:
-            file_path = Path(root) / file
-            if include_ext and not file_path.suffix in include_ext:
-                continue
-            if exclude_ext and file_path.suffix in exclude_ext:
-                continue
+    # One substring scan per rule decides which rules can fire at all; when
+    # none can, only blank lines go, without the per-line state machine.
+    rules = applicable_rules(content, rules)
+    if not rules:
+        return '\n'.join(filter(str.strip, content.split('\n')))
+    processor = LineProcessor(rules)
+    processor.feed(content.split('\n'))
+    return '\n'.join(processor.output)
 
-            print(f"Processing: {file_path}")
-            with open(file_path, 'r', encoding='utf-8') as f:
-                content = f.read()
 
-            modified_content = process_content(
-                content, modify_python and file_path.suffix == '.py')
+ENGINES = ('line', 'tokenize', 'skeleton')
 
-            clipboard_content += f"# File: {file_path}\n{modified_content}\n\n"
 
-    pyperclip.copy(clipboard_content)
-    print("Files copied to clipboard.")
+def get_engine(name):
+    """Return the process_content implementation for an --engine value."""
+    if name == 'tokenize':
+        from tokenize_engine import process_content_tokenize
+        return process_content_tokenize
+    if name == 'skeleton':
+        from skeleton import process_content_skeleton
+        return process_content_skeleton
+    if name != 'line':
+        raise ValueError(f"Unknown engine: {name}")
+    return process_content
 
 
-if __name__ == "__main__":
+def copy_to_clipboard(path, include_ext=None, exclude_ext=None, include_dirs=None, exclude_dirs=None, modify_python=False, jobs=1, output=None, cache=None, engine='line', rules=DEFAULT_RULES, include_globs=None, exclude_globs=None, gitignore=False, budget=None, priority=None, since=None, manifest=None, large_files=None, hooks=None, dedup=None, prefetch=0):
+    """Dump a file or directory. hooks is an optional stats.Hooks to subscribe to progress and timing events."""
+    start = time.perf_counter()
+    if os.path.isdir(path):
+        copy_directory_to_clipboard(path, include_ext, exclude_ext, include_dirs, exclude_dirs, modify_python, jobs, output, cache, engine, rules, include_globs, exclude_globs, gitignore, budget, priority, since, manifest, large_files, hooks, dedup, prefetch)
+    elif os.path.isfile(path):
+        copy_file_to_clipboard(path, modify_python, output, cache, engine, rules, large_files, hooks)
+    if hooks is not None:
+        hooks.emit('done', time.perf_counter() - start)
+
+
+def decode_content(data):
+    # Same result as reading in text mode with universal newlines.
+    return decode(data).replace('\r\n', '\n').replace('\r', '\n')
+
+
+def stream_lines(file_path, modify, rules, style=None):
+    """Yield the processed text of file_path in batches; joined, they equal the in-memory result."""
+    lines = iter_text_lines(file_path)
+    processor = None
+    if style is not None:
+        from languages import comment_lines
+        lines = comment_lines(lines, style)
+    elif modify:
+        processor = LineProcessor(rules)
+    started = False
+    while True:
+        batch = list(islice(lines, BATCH_LINES))
+        if not batch:
+            return
+        if processor is not None:
+            processor.feed(batch)
+            batch = processor.output[:]
+            del processor.output[:]
+        if batch:
+            # Lines are joined with '\n' across batches as well, with no newline after the last.
+            yield ('\n' if started else '') + '\n'.join(batch)
+            started = True
+
+
+def process_large_file(file_path, size, modify, transform, rules, large_files, style=None):
+    if large_files.mode == 'skip':
+        return large_files.skip_note(file_path, size)
+    if large_files.mode == 'truncate':
+        return f"# File: {file_path}\n{transform(large_files.read_truncated(file_path, size))}\n\n"
+    # Streaming always uses the line engine, the only one that works on batches of lines.
+    return StreamedChunk(file_path, size, partial(stream_lines, modify=modify, rules=rules, style=style))
+
+
+def process_file(file_path, modify_python, cache=None, engine='line', rules=DEFAULT_RULES, large_files=None, timings=None, read=None, hit=None):
+    """Return the '# File:' chunk for file_path.
+
+    large_files is an optional LargeFilePolicy; files over its threshold skip
+    the cache and may come back as a StreamedChunk instead of a string.
+    timings, if given, is a dict that receives the 'transform' seconds and
+    the 'bytes' that were transformed. read, if given, replaces
+    sniff.read_text for getting the file's bytes (see prefetch). hit, if
+    given, is an (os.stat_result, content) pair the caller already got from
+    cache.lookup; the file is then neither stat'ed nor looked up again. Binary
+    files (see sniff) are replaced by a one-line note after reading only
+    their head, and a file that cannot be read gets an error note instead of
+    failing the whole dump.
+    """
+    try:
+        return read_file(file_path, modify_python, cache, engine, rules, large_files, timings, read or read_text, hit)
+    except BinaryFile as e:
+        return binary_note(e)
+    except OSError as e:
+        return f"# File: {file_path}\n# Error: {e.strerror or e}\n\n"
+
+
+def comment_style(ext, modify_python, rules):
+    """The languages.COMMENT_STYLES style whose comments are stripped from files with extension ext, or None."""
+    if not modify_python or 'other_comments' not in rules:
+        return None
+    from languages import COMMENT_STYLES
+    return COMMENT_STYLES.get(ext)
+
+
+def cache_variant(ext, modify_python, engine, rules):
+    """The ContentCache variant read_file stores a file with extension ext under."""
+    style = comment_style(ext, modify_python, rules)
+    if style is not None:
+        return f"{TRANSFORM_VERSION}:other_comments:{style}"
+    if modify_python and ext == '.py':
+        return f"{TRANSFORM_VERSION}:{engine}:{','.join(sorted(rules))}"
+    return f"{TRANSFORM_VERSION}:raw"
+
+
+def read_file(file_path, modify_python, cache, engine, rules, large_files, timings, read, hit=None):
+    ext = suffix(os.path.basename(file_path))
+    modify = modify_python and ext == '.py'
+    process = get_engine(engine)
+    variant = cache_variant(ext, modify_python, engine, rules)
+    style = comment_style(ext, modify_python, rules)
+    if style is not None:
+        # Other languages only get their comments and blank lines stripped, and only when asked to.
+        from languages import strip_comments
+        process = lambda content, modify, rules: strip_comments(content, style)
+
+    def transform(data):
+        if timings is None:
+            return process(decode_content(data), modify, rules)
+        start = time.perf_counter()
+        result = process(decode_content(data), modify, rules)
+        timings['transform'] = timings.get('transform', 0.0) + time.perf_counter() - start
+        timings['bytes'] = timings.get('bytes', 0) + len(data)
+        return result
+
+    st, cached = hit if hit is not None else (None, None)
+    if large_files is not None:
+        if st is None:
+            st = os.stat(file_path)
+        if large_files.applies(st.st_size):
+            sniff(file_path)
+            return process_large_file(file_path, st.st_size, modify, transform, rules, large_files, style)
+
+    if cached is not None:
+        modified_content = cached
+    elif cache is not None:
+        modified_content = cache.get(file_path, variant, transform, st, read)
+    else:
+        modified_content = transform(read(file_path))
+
+    return f"# File: {file_path}\n{modified_content}\n\n"
+
+
+def process_file_timed(file_path, modify_python, cache=None, engine='line', rules=DEFAULT_RULES, large_files=None, read=None, hit=None):
+    """process_file that also returns (read seconds, transform seconds, bytes), for stats hooks."""
+    timings = {}
+    start = time.perf_counter()
+    chunk = process_file(file_path, modify_python, cache, engine, rules, large_files, timings, read, hit)
+    elapsed = time.perf_counter() - start
+    transform_seconds = timings.get('transform', 0.0)
+    # Cache hits and streamed files are never transformed here; fall back to the size on disk.
+    nbytes = timings.get('bytes')
+    if nbytes is None:
+        try:
+            nbytes = os.path.getsize(file_path)
+        except OSError:
+            nbytes = 0
+    return chunk, elapsed - transform_seconds, transform_seconds, nbytes
+
+
+def report_files(pairs, hooks):
+    for file_path, (chunk, read_seconds, transform_seconds, nbytes) in pairs:
+        hooks.emit('file', file_path, read_seconds, transform_seconds, nbytes)
+        yield file_path, chunk
+
+
+# Bytes a file costs beyond its size when balancing batches (open, stat, header, pickling).
+FILE_OVERHEAD = 4096
+MAX_BATCH_FILES = 64
+
+
+def size_batches(file_paths, sizes, workers):
+    """Split file_paths into contiguous batches of roughly balanced cost for a pool of workers.
+
+    Each batch takes about 1/(2*workers) of the bytes still to go (guided
+    scheduling): early batches are big, so there is little per-task
+    overhead, and the last ones are small, so no worker is left finishing a
+    long batch while the others idle. sizes maps paths to byte counts;
+    missing paths count as empty files.
+    """
+    sizes = sizes or {}
+    costs = [sizes.get(file_path, 0) + FILE_OVERHEAD for file_path in file_paths]
+    remaining = sum(costs)
+    batches, batch, batch_cost = [], [], 0
+    for file_path, cost in zip(file_paths, costs):
+        batch.append(file_path)
+        batch_cost += cost
+        if batch_cost >= remaining // (2 * workers) or len(batch) >= MAX_BATCH_FILES:
+            batches.append(batch)
+            remaining -= batch_cost
+            batch, batch_cost = [], 0
+    if batch:
+        batches.append(batch)
+    return batches
+
+
+def process_batch(file_paths, worker):
+    return [worker(file_path) for file_path in file_paths]
+
+
+def process_files(file_paths, modify_python, jobs=1, cache=None, engine='line', rules=DEFAULT_RULES, large_files=None, hooks=None, executor=None, sizes=None, prefetch=0):
+    """Yield (file_path, chunk) pairs in the order of file_paths.
+
+    With jobs > 1 the reads and process_content calls are fanned out to a
+    process pool in size_batches (sizes maps paths to their sizes, if
+    known); jobs=0 uses one worker per CPU. cache is an optional
+    cache.ContentCache, engine one of ENGINES, rules a sequence of rule
+    names from rules.RULES, large_files a LargeFilePolicy and hooks a
+    stats.Hooks that gets a file event per file. executor is an already
+    running process pool to use instead of starting one; it is left open.
+    Without a pool, prefetch > 0 keeps that many reads in flight on a thread
+    pool ahead of processing (see prefetch.read_ahead), for storage where
+    each read waits on a round trip. Files the cache already holds are not
+    prefetched.
+    """
+    if jobs == 0:
+        jobs = os.cpu_count() or 1
+
+    timed = hooks is not None and hooks.wants('file')
+    process = process_file_timed if timed else process_file
+    if jobs <= 1 and executor is None:
+        if prefetch:
+            from prefetch import prefetched, read_ahead
+            skip_above = large_files.threshold if large_files is not None else None
+            skip = None
+            hits = {}
+            if cache is not None:
+                # Files the cache answers from their stat key would be read for nothing; what
+                # the lookup found is handed on so process_file does not ask again.
+                skip = partial(cache_hit, hits, cache, modify_python, engine, rules)
+            pairs = ((file_path, process(file_path, modify_python, cache, engine, rules, large_files, read=prefetched(future), hit=hits.pop(file_path, None)))
+                     for file_path, future in read_ahead(file_paths, prefetch, sizes, skip_above=skip_above, skip=skip))
+        else:
+            pairs = ((file_path, process(file_path, modify_python, cache, engine, rules, large_files)) for file_path in file_paths)
+        yield from report_files(pairs, hooks) if timed else pairs
+        return
+
+    batches = size_batches(list(file_paths), sizes, jobs)
+    worker = partial(process, modify_python=modify_python, cache=cache, engine=engine, rules=rules, large_files=large_files)
+    if executor is not None:
+        yield from map_files(executor, worker, batches, hooks if timed else None)
+        return
+    from concurrent.futures import ProcessPoolExecutor
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        yield from map_files(executor, worker, batches, hooks if timed else None)
+
+
+def cache_hit(hits, cache, modify_python, engine, rules, file_path):
+    """Whether cache holds file_path under the variant read_file would use; a hit goes into hits as (stat, content)."""
+    try:
+        st = os.stat(file_path)
+    except OSError:
+        return False
+    content = cache.lookup(file_path, cache_variant(suffix(os.path.basename(file_path)), modify_python, engine, rules), st)
+    if content is None:
+        return False
+    hits[file_path] = (st, content)
+    return True
+
+
+def map_files(executor, worker, batches, hooks=None):
+    results = executor.map(partial(process_batch, worker=worker), batches)
+    try:
+        pairs = (pair for batch, chunks in zip(batches, results) for pair in zip(batch, chunks))
+        yield from report_files(pairs, hooks) if hooks is not None else pairs
+    finally:
+        # Closing early (e.g. a cancelled GUI run) drops the queued work instead of waiting for it.
+        results.close()
+
+
+def write_chunks(chunks, sink, hooks=None):
+    """Stream (file_path, chunk) pairs into sink and close it. A None file_path marks a trailer.
+
+    With hooks, the time spent writing is reported as the emit stage and the
+    time spent closing the sink (the clipboard copy, for the default sink) as
+    the output stage. Sizes are counted in characters.
+    """
+    emit_seconds, size = 0.0, 0
+    # Archive sinks start a new member per chunk and may store some chunks whole.
+    start_entry = getattr(sink, 'start_entry', None)
+    with sink:
+        for file_path, chunk in chunks:
+            if file_path is not None:
+                print(f"Processing: {file_path}", file=sink.status_stream)
+            start = time.perf_counter()
+            if start_entry is not None and start_entry(file_path, chunk):
+                size += chunk.size
+            elif isinstance(chunk, str):
+                sink.write(chunk)
+                size += len(chunk)
+            else:
+                for piece in chunk:
+                    sink.write(piece)
+                    size += len(piece)
+            emit_seconds += time.perf_counter() - start
+        closing = time.perf_counter()
+    if hooks is not None:
+        hooks.emit('stage', 'emit', emit_seconds, size)
+        hooks.emit('stage', 'output', time.perf_counter() - closing, size)
+
+
+def copy_file_to_clipboard(file_path, modify_python, output=None, cache=None, engine='line', rules=DEFAULT_RULES, large_files=None, hooks=None):
+    sink = open_sink(output)
+    write_chunks(process_files([file_path], modify_python, cache=cache, engine=engine, rules=rules, large_files=large_files, hooks=hooks), sink, hooks)
+    print(f"File {sink.message}.", file=sink.status_stream)
+
+def copy_files_to_clipboard(files, modify_python=True, jobs=1, output=None, cache=None, engine='line', rules=DEFAULT_RULES, large_files=None, hooks=None):
+    """Dump a list of files; a file listed twice (under any spelling) is dumped once."""
+    from inputs import iter_input_entries
+    dump_entries(iter_input_entries(files), open_sink(output), modify_python, jobs, cache, engine, rules, large_files=large_files, hooks=hooks)
+
+def copy_paths_to_clipboard(sources, file_list=(), include_ext=None, exclude_ext=None, include_dirs=None, exclude_dirs=None, modify_python=False, jobs=1, output=None, cache=None, engine='line', rules=DEFAULT_RULES, include_globs=None, exclude_globs=None, gitignore=False, budget=None, priority=None, manifest=None, large_files=None, hooks=None, dedup=None, prefetch=0):
+    """Dump any number of directories, files and glob patterns plus a list of files as one deduplicated dump."""
+    from inputs import iter_input_entries
+    start = time.perf_counter()
+    sink = open_sink(output)
+    entries = iter_input_entries(sources, file_list, include_ext, exclude_ext, include_dirs, exclude_dirs, include_globs, exclude_globs, gitignore)
+    dump_entries(entries, sink, modify_python, jobs, cache, engine, rules, budget, priority, manifest, large_files, hooks, None, dedup, prefetch)
+    print(f"Files {sink.message}.", file=sink.status_stream)
+    if hooks is not None:
+        hooks.emit('done', time.perf_counter() - start)
+
+def iter_directory_entries(src, include_ext=None, exclude_ext=None, include_dirs=None, exclude_dirs=None, include_globs=None, exclude_globs=None, gitignore=False, since=None):
+    filters = Filters(include_ext, exclude_ext, include_dirs, exclude_dirs, include_globs, exclude_globs)
+    if gitignore:
+        from ignore import IgnoreFilters
+        filters = IgnoreFilters(src, filters)
+    if since is not None:
+        from changes import git_changed_entries
+        return git_changed_entries(src, since, filters)
+    return scan(src, filters)
+
+def iter_directory_files(src, include_ext=None, exclude_ext=None, include_dirs=None, exclude_dirs=None, include_globs=None, exclude_globs=None, gitignore=False):
+    for entry in iter_directory_entries(src, include_ext, exclude_ext, include_dirs, exclude_dirs, include_globs, exclude_globs, gitignore):
+        yield entry.path
+
+def record_sizes(entries, sizes):
+    for entry in entries:
+        sizes[entry.path] = entry.size
+        yield entry
+
+def settings_key(modify_python, engine, rules, large_files):
+    """A string that changes whenever these settings would change the dump of an unchanged file."""
+    return f"{TRANSFORM_VERSION}:{int(bool(modify_python))}:{engine}:{','.join(sorted(rules))}:{large_files!r}"
+
+def dump_entries(entries, sink, modify_python=False, jobs=1, cache=None, engine='line', rules=DEFAULT_RULES, budget=None, priority=None, manifest=None, large_files=None, hooks=None, executor=None, dedup=None, prefetch=0):
+    """Run scanner Entries through the dump pipeline into sink.
+
+    The manifest drops unchanged files, priority orders the rest, dedup (a
+    dedup.Deduplicator) holds back copies of files already seen, an archive
+    sink holds back files it can copy from its previous archive, the budget
+    decides what fits, and the chunks are processed and written in order.
+    """
+    entries = timed_iter(entries, 'scan', hooks, lambda entry: entry.size)
+    if manifest is not None:
+        entries = manifest.changed(entries)
+    if priority is not None:
+        entries = prioritize(list(entries), priority)
+    if dedup is not None:
+        entries = dedup.filter(entries)
+    reusing = getattr(sink, 'reusing', None)
+    if reusing is not None:
+        entries = reusing(entries, settings_key(modify_python, engine, rules, large_files))
+    sizes = None
+    if jobs != 1 or executor is not None or prefetch:
+        sizes = {}
+        entries = record_sizes(entries, sizes)
+    file_paths = (entry.path for entry in entries) if budget is None else budget.gate(entries)
+    chunks = process_files(file_paths, modify_python, jobs, cache, engine, rules, large_files, hooks, executor, sizes, prefetch)
+    if reusing is not None:
+        chunks = sink.splice(chunks)
+    if budget is not None:
+        chunks = budget.admit(chunks)
+    if dedup is not None:
+        chunks = dedup.merge(chunks)
+    if manifest is not None:
+        chunks = manifest.record(chunks)
+    write_chunks(chunks, sink, hooks)
+    if manifest is not None:
+        manifest.save()
+
+
+def copy_directory_to_clipboard(src, include_ext=None, exclude_ext=None, include_dirs=None, exclude_dirs=None, modify_python=False, jobs=1, output=None, cache=None, engine='line', rules=DEFAULT_RULES, include_globs=None, exclude_globs=None, gitignore=False, budget=None, priority=None, since=None, manifest=None, large_files=None, hooks=None, dedup=None, prefetch=0):
+    sink = open_sink(output)
+    entries = iter_directory_entries(src, include_ext, exclude_ext, include_dirs, exclude_dirs, include_globs, exclude_globs, gitignore, since)
+    dump_entries(entries, sink, modify_python, jobs, cache, engine, rules, budget, priority, manifest, large_files, hooks, None, dedup, prefetch)
+    print(f"Files {sink.message}.", file=sink.status_stream)
+
+
+def single_file_args(argv):
+    """Return (file, output) when argv is just a file, optionally with --output; otherwise None."""
+    if len(argv) == 3 and argv[1] == '--output':
+        source, output = argv[0], argv[2]
+    elif len(argv) == 2 and argv[1].startswith('--output='):
+        source, output = argv[0], argv[1][len('--output='):]
+    elif len(argv) == 1:
+        source, output = argv[0], None
+    else:
+        return None
+    if source.startswith('-') or not os.path.isfile(source):
+        return None
+    return source, output
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    single = single_file_args(argv)
+    if single is not None:
+        # The common `copy_files.py file.py`: the same defaults as below, without argparse or the optional subsystems.
+        source, output = single
+        copy_file_to_clipboard(source, True, output, large_files=LargeFilePolicy())
+        return
+
+    import argparse
     parser = argparse.ArgumentParser(
         description="Copy files' contents to the clipboard with optional filtering and modification.")
-    parser.add_argument("source", type=str, help="Source directory path or file path")
+    parser.add_argument("sources", type=str, nargs='*', metavar="source",
+                        help="Source directories, files or glob patterns; several are dumped together without duplicates")
+    parser.add_argument("--files_from", type=str, metavar="PATH",
+                        help="Also dump the files listed in PATH ('-' for stdin), NUL-separated (git ls-files -z, fd -0) "
+                             "or one per line")
     parser.add_argument("--include_ext", nargs='*',
                         help="Extensions to include")
     parser.add_argument("--exclude_ext", nargs='*',
@@ -167,16 +522,178 @@ if __name__ == "__main__":
                         help="Directories to include")
     parser.add_argument("--exclude_dirs", nargs='*',
                         help="Directories to exclude")
+    parser.add_argument("--include_glob", nargs='*',
+                        help="Glob patterns a file's relative path must match (e.g. 'src/*.py')")
+    parser.add_argument("--exclude_glob", nargs='*',
+                        help="Glob patterns for files and directories to skip (e.g. '*.min.js' 'build')")
+    parser.add_argument("--gitignore", action='store_true',
+                        help="Skip files ignored by .gitignore, .git/info/exclude and .copyignore")
+    parser.add_argument("--max_bytes", type=int,
+                        help="Stop adding files once the output reaches this many bytes")
+    parser.add_argument("--max_tokens", type=int,
+                        help="Stop adding files once the output reaches roughly this many tokens")
+    parser.add_argument("--priority", choices=PRIORITIES,
+                        help="Order files by size (smallest first), recency (newest first) or depth (shallowest first)")
+    parser.add_argument("--since", type=str, metavar="REF",
+                        help="Only copy files that differ from this git ref (plus untracked files)")
+    parser.add_argument("--since_last", action='store_true',
+                        help="Only copy files that changed since the last --since_last run of this source")
+    parser.add_argument("--dedup", action='store_true',
+                        help="Emit each distinct file body once; later identical files become a one-line reference")
+    parser.add_argument("--large_file_size", type=float, default=DEFAULT_THRESHOLD / (1024 * 1024),
+                        help="Files above this many MB are handled according to --large_files")
+    parser.add_argument("--large_files", choices=LARGE_FILE_MODES, default='stream',
+                        help="Stream large files in bounded memory, truncate them to their head and tail, or skip them")
     parser.add_argument("--modify_python", action='store_true',
                         help="Modify Python files to selectively omit content")
     parser.add_argument("--gui", action='store_true',
-                        help="Run the GUI version of the script") 
+                        help="Run the GUI version of the script")
+    parser.add_argument("--jobs", type=int, default=1,
+                        help="Number of worker processes for reading and processing files (0 = one per CPU)")
+    parser.add_argument("--prefetch", type=int, default=0, metavar="N",
+                        help="Keep N file reads in flight on background threads ahead of processing, for network or "
+                             "cold-cache storage (ignored with --jobs)")
+    parser.add_argument("--output", type=str,
+                        help="Write to this file instead of the clipboard ('-' for stdout, '.gz' suffix for gzip, "
+                             "'.cfa' suffix for an indexed archive)")
+    parser.add_argument("--clipboard", choices=CLIPBOARD_BACKENDS, default='auto',
+                        help="How to reach the clipboard: a streaming tool, pyperclip, or none to discard the output "
+                             "(default: auto-detect)")
+    parser.add_argument("--clipboard_limit", type=float, default=DEFAULT_CLIPBOARD_LIMIT / (1024 * 1024), metavar="MB",
+                        help="Write dumps larger than this many MB to --clipboard_fallback instead (0 = no limit)")
+    parser.add_argument("--clipboard_fallback", type=str, metavar="PATH",
+                        help="Where oversized dumps go: a file path or '-' for stdout (default: copy_files_dump.txt in the temp directory)")
+    parser.add_argument("--no_cache", action='store_true',
+                        help="Do not read or write the on-disk cache of processed files")
+    parser.add_argument("--cache_size", type=int, default=256,
+                        help="Maximum size of the on-disk cache in MB")
+    parser.add_argument("--engine", choices=ENGINES, default='line',
+                        help="Python stripping engine: the line state machine, the tokenize-based one, or skeleton "
+                             "(signatures only, see --skeleton)")
+    parser.add_argument("--skeleton", action='store_const', const='skeleton', dest='engine',
+                        help="Outline Python files: keep class and def signatures and decorators, collapse function "
+                             "bodies to '...' (same as --engine skeleton)")
+    parser.add_argument("--rules", type=parse_rules, default=DEFAULT_RULES,
+                        help=f"Comma-separated omission rules for Python files (available: {', '.join(RULES)}; "
+                             f"default: {','.join(DEFAULT_RULES)})")
+    parser.add_argument("--serve", type=str, nargs='?', const='', metavar="SOCKET",
+                        help="Run as a daemon answering dump requests on a Unix socket, keeping the cache, "
+                             "workers and file index warm (default socket: $XDG_RUNTIME_DIR/copy_files.sock)")
+    parser.add_argument("--connect", type=str, nargs='?', const='', metavar="SOCKET",
+                        help="Ask a running --serve daemon for the dump of source instead of doing the work here")
+    parser.add_argument("--stats", type=int, nargs='?', const=DEFAULT_TOP, metavar="N",
+                        help=f"Print per-stage timings and the N slowest files to stderr (default N: {DEFAULT_TOP})")
+    parser.add_argument("--profile", type=str, metavar="PATH",
+                        help="Profile the run and write the result to PATH (the main process only, not --jobs workers)")
+    parser.add_argument("--profile_mode", choices=PROFILE_MODES, default='cprofile',
+                        help="cprofile writes pstats data; tracemalloc writes the top allocation sites as text")
     
     # by default modify_python is True
     modify_python = True
     # if modify_python:
     #     modify_python = False
 
-    args = parser.parse_args()
-    copy_to_clipboard(args.source, args.include_ext, args.exclude_ext,
-                    args.include_dirs, args.exclude_dirs, modify_python)
+    args = parser.parse_args(argv)
+    if not args.sources and args.files_from is None and args.serve is None and not args.gui:
+        parser.error("the source argument is required")
+    # A single source keeps the original single-path behaviour; anything more goes through copy_paths_to_clipboard.
+    from inputs import is_pattern
+    # A glob is expanded by copy_paths_to_clipboard even when it is the only source.
+    multiple = len(args.sources) > 1 or args.files_from is not None or any(map(is_pattern, args.sources))
+    args.source = None if multiple or not args.sources else args.sources[0]
+    if multiple and (args.connect is not None or args.since):
+        parser.error("--connect and --since take a single source")
+    if args.source is not None and args.connect is None and not os.path.exists(args.source):
+        parser.error(f"No such file or directory: {args.source}")
+    if args.since and args.connect is None and args.source is not None and os.path.isdir(args.source):
+        from changes import verify_ref
+        try:
+            verify_ref(args.source, args.since)
+        except ValueError as e:
+            parser.error(str(e))
+
+    if args.connect is not None:
+        from daemon import request
+        status, body = request(args.source, args.output, args.connect or None, max_bytes=args.max_bytes,
+                               max_tokens=args.max_tokens, priority=args.priority, since=args.since)
+        if not status['ok']:
+            sys.exit(status['error'])
+        if args.output == '-':
+            sys.stdout.buffer.write(body)
+        else:
+            print(f"Files {status['message']}.")
+        return
+
+    if args.gui:
+        from gui2 import FileProcessorApp
+        FileProcessorApp().mainloop()
+        return
+
+    cache = None
+    # For a single file, opening the cache costs more than processing the file.
+    if not args.no_cache and (args.serve is not None or multiple or os.path.isdir(args.source)):
+        from cache import ContentCache
+        cache = ContentCache(max_bytes=args.cache_size * 1024 * 1024)
+
+    budget = None
+    if args.max_bytes or args.max_tokens:
+        budget = Budget(args.max_bytes, args.max_tokens)
+
+    large_files = LargeFilePolicy(int(args.large_file_size * 1024 * 1024), args.large_files)
+
+    if args.serve is not None:
+        from copier import Copier
+        from daemon import serve
+        copier = Copier(args.include_ext, args.exclude_ext, args.include_dirs, args.exclude_dirs, modify_python, args.jobs,
+                        cache, args.engine, args.rules, args.include_glob, args.exclude_glob, args.gitignore, large_files,
+                        watch=True, dedup=args.dedup)
+        serve(copier, args.serve or None)
+        return
+
+    manifest = None
+    if args.since_last:
+        from changes import Manifest
+        manifest = Manifest(args.sources if multiple else args.source)
+
+    output = args.output
+    if output is None:
+        output = clipboard_sink(args.clipboard, int(args.clipboard_limit * 1024 * 1024), args.clipboard_fallback)
+
+    dedup = None
+    if args.dedup:
+        from dedup import Deduplicator
+        dedup = Deduplicator()
+
+    hooks = stats = None
+    if args.stats is not None:
+        from stats import Hooks, Stats
+        hooks = Hooks()
+        stats = Stats(hooks, args.stats)
+
+    if multiple:
+        from inputs import read_file_list
+        file_list = read_file_list(args.files_from) if args.files_from is not None else ()
+        run = copy_paths_to_clipboard
+        run_args = (args.sources, file_list, args.include_ext, args.exclude_ext,
+                    args.include_dirs, args.exclude_dirs, modify_python, args.jobs, output, cache, args.engine, args.rules,
+                    args.include_glob, args.exclude_glob, args.gitignore, budget, args.priority,
+                    manifest, large_files, hooks, dedup, args.prefetch)
+    else:
+        run = copy_to_clipboard
+        run_args = (args.source, args.include_ext, args.exclude_ext,
+                    args.include_dirs, args.exclude_dirs, modify_python, args.jobs, output, cache, args.engine, args.rules,
+                    args.include_glob, args.exclude_glob, args.gitignore, budget, args.priority,
+                    args.since, manifest, large_files, hooks, dedup, args.prefetch)
+    if args.profile:
+        from stats import run_profiled
+        run_profiled(args.profile_mode, args.profile, run, *run_args)
+    else:
+        run(*run_args)
+    if cache is not None:
+        cache.close()
+    if stats is not None:
+        print(stats.report(), end='', file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
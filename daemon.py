@@ -0,0 +1,94 @@
+import json
+import os
+import socket
+import socketserver
+import sys
+
+from budget import Budget
+
+
+def default_socket_path():
+    runtime_dir = os.environ.get('XDG_RUNTIME_DIR')
+    if runtime_dir:
+        return os.path.join(runtime_dir, 'copy_files.sock')
+    from cache import default_cache_path
+    return os.path.join(os.path.dirname(default_cache_path()), 'copy_files.sock')
+
+
+class DumpHandler(socketserver.StreamRequestHandler):
+    """One request per connection: a JSON line in, a JSON status line (and the dump for output '-') out.
+
+    Request keys: path, and optionally output (a path, '-' to get the dump
+    back on the socket, or null for the daemon's clipboard), max_bytes,
+    max_tokens, priority and since. {"command": "shutdown"} stops the server.
+    """
+
+    def handle(self):
+        try:
+            request = json.loads(self.rfile.readline())
+            if request.get('command') == 'shutdown':
+                self.server.stopping = True
+                self.reply({'ok': True, 'message': 'shutting down'})
+                return
+            budget = None
+            if request.get('max_bytes') or request.get('max_tokens'):
+                budget = Budget(request.get('max_bytes'), request.get('max_tokens'))
+            options = (budget, request.get('priority'), request.get('since'))
+            output = request.get('output')
+            if output == '-':
+                body = self.server.copier.render(request['path'], *options).encode('utf-8')
+                self.reply({'ok': True, 'length': len(body)}, body)
+            else:
+                sink = self.server.copier.dump(request['path'], output, *options)
+                self.reply({'ok': True, 'message': sink.message})
+        except Exception as e:
+            self.reply({'ok': False, 'error': f"{type(e).__name__}: {e}"})
+
+    def reply(self, header, body=b''):
+        self.wfile.write(json.dumps(header).encode('utf-8') + b'\n' + body)
+
+
+def serve(copier, socket_path=None):
+    """Answer dump requests on a Unix socket with copier until a shutdown request or Ctrl-C.
+
+    Requests are handled one at a time; the copier's pool and cache stay
+    warm between them. The socket is only accessible to the current user.
+    """
+    socket_path = socket_path or default_socket_path()
+    os.makedirs(os.path.dirname(socket_path), exist_ok=True)
+    if os.path.exists(socket_path):
+        os.unlink(socket_path)
+    server = socketserver.UnixStreamServer(socket_path, DumpHandler)
+    os.chmod(socket_path, 0o600)
+    server.copier = copier
+    server.stopping = False
+    print(f"Serving on {socket_path}", file=sys.stderr)
+    try:
+        while not server.stopping:
+            server.handle_request()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        os.unlink(socket_path)
+        copier.close()
+
+
+def request(path, output=None, socket_path=None, **options):
+    """Send one request to a running daemon and return (status dict, body bytes).
+
+    Relative paths are resolved here, since the daemon has its own working directory.
+    """
+    message = dict(options)
+    if path is not None:
+        message['path'] = os.path.abspath(path)
+    if output is not None:
+        message['output'] = output if output == '-' else os.path.abspath(output)
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.connect(socket_path or default_socket_path())
+        sock.sendall(json.dumps(message).encode('utf-8') + b'\n')
+        sock.shutdown(socket.SHUT_WR)
+        with sock.makefile('rb') as f:
+            status = json.loads(f.readline())
+            body = f.read()
+    return status, body
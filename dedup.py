@@ -0,0 +1,118 @@
+import hashlib
+from collections import deque
+
+READ_BLOCK = 1024 * 1024
+
+
+def file_digest(file_path):
+    h = hashlib.blake2b(digest_size=16)
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(READ_BLOCK), b''):
+            h.update(block)
+    return h.digest()
+
+
+def reference_note(file_path, original):
+    return f"# File: {file_path} (identical to {original})\n\n"
+
+
+class Splice:
+    """Puts entries that skip processing back in their place in the chunk stream.
+
+    A filter calls passed() for each entry it lets through to processing and
+    hold() for each one it keeps back. merge() then yields the processed
+    chunks with release(item) spliced in after the entry that preceded each
+    held item. Entries that were passed but never came out of processing
+    (left out by a budget, say) do not hold up the rest.
+    """
+
+    def __init__(self):
+        self.sequence = {}
+        self.pending = deque()
+
+    def passed(self, file_path):
+        self.sequence[file_path] = len(self.sequence)
+
+    def hold(self, item):
+        self.pending.append((len(self.sequence) - 1, item))
+
+    def release(self, item):
+        """Yield the (file_path, chunk) pairs for a held item."""
+        raise NotImplementedError
+
+    def emitted(self, file_path):
+        """Called for every processed chunk as it goes out."""
+
+    def _flush(self, upto):
+        while self.pending and (upto is None or self.pending[0][0] <= upto):
+            yield from self.release(self.pending.popleft()[1])
+
+    def merge(self, chunks):
+        for file_path, chunk in chunks:
+            if file_path is None:
+                yield from self._flush(None)
+                yield file_path, chunk
+                continue
+            seq = self.sequence.get(file_path)
+            if seq is not None:
+                yield from self._flush(seq - 1)
+            self.emitted(file_path)
+            yield file_path, chunk
+            if seq is not None:
+                yield from self._flush(seq)
+        yield from self._flush(None)
+
+
+class Deduplicator(Splice):
+    """Emits each distinct file body once and replaces later copies with a one-line reference.
+
+    filter() passes through the first entry with each content and holds back
+    the rest. A file is only hashed once another file of the same size has
+    been seen, so a tree without equal sizes is never hashed at all. merge()
+    puts a reference note for each held-back file back into the chunk stream
+    at its original position. A reference is dropped if its original never
+    made it into the dump (for instance because a budget left it out).
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.first_by_size = {}
+        self.by_digest = {}
+        self.hashed = set()
+        self.done = set()
+        self.duplicates = 0
+
+    def _original(self, entry):
+        first = self.first_by_size.get(entry.size)
+        if first is None:
+            self.first_by_size[entry.size] = entry.path
+            return None
+        if first not in self.hashed:
+            self.hashed.add(first)
+            self.by_digest.setdefault(file_digest(first), first)
+        digest = file_digest(entry.path)
+        original = self.by_digest.get(digest)
+        if original is None:
+            self.by_digest[digest] = entry.path
+        return original
+
+    def filter(self, entries):
+        for entry in entries:
+            try:
+                original = self._original(entry)
+            except OSError:
+                original = None
+            if original is None:
+                self.passed(entry.path)
+                yield entry
+            else:
+                self.duplicates += 1
+                self.hold((entry.path, original))
+
+    def emitted(self, file_path):
+        self.done.add(file_path)
+
+    def release(self, item):
+        file_path, original = item
+        if original in self.done:
+            yield file_path, reference_note(file_path, original)
@@ -0,0 +1,348 @@
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import sys
+import threading
+from array import array
+from pathlib import Path
+
+from scanner import Entry, Filters, suffix, walk
+
+POLL_INTERVAL = 2.0
+
+IN_MODIFY = 0x2
+IN_ATTRIB = 0x4
+IN_CLOSE_WRITE = 0x8
+IN_MOVED_FROM = 0x40
+IN_MOVED_TO = 0x80
+IN_CREATE = 0x100
+IN_DELETE = 0x200
+IN_Q_OVERFLOW = 0x4000
+IN_ONLYDIR = 0x1000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+WATCH_MASK = IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_ONLYDIR
+EVENT_HEADER = struct.Struct('iIII')
+
+
+class FileIndex:
+    """In-memory snapshot of a directory tree that filters without touching disk.
+
+    Entries live in parallel arrays indexed by entry id: names, parent ids,
+    sizes, mtimes and extension ids (into self.extensions). Parents always
+    come before their children, so one forward pass over the arrays sees the
+    tree in walk order. Removed entries are tombstoned in alive rather than
+    compacted. watch() keeps the snapshot current with inotify on Linux and
+    periodic rescans elsewhere; version goes up on every change. With
+    filters, only what they pass is indexed, so pruned directories are never
+    listed or watched; relpaths are relative to root, as in a walk of root.
+    """
+
+    def __init__(self, root, filters=None):
+        self.root = os.fspath(Path(root))
+        self.filters = filters
+        self.lock = threading.RLock()
+        self.version = 0
+        self.watcher = None
+        self.ready = threading.Event()
+        self._reset()
+
+    def _reset(self):
+        self.names = []
+        self.parents = array('q')
+        self.is_dir = bytearray()
+        self.alive = bytearray()
+        self.sizes = array('q')
+        self.mtimes = array('q')
+        self.ext_ids = array('l')
+        self.extensions = []
+        self.ext_lookup = {}
+        self.children = {-1: {}}
+        self.dir_paths = {-1: self.root}
+        self.dir_ids = {self.root: -1}
+
+    def __len__(self):
+        return len(self.names)
+
+    def build(self):
+        """(Re)scan the whole tree."""
+        with self.lock:
+            self._reset()
+            self._add_tree(-1)
+            self.version += 1
+        self.ready.set()
+        return self
+
+    def _ext_id(self, name):
+        ext = suffix(name)
+        ext_id = self.ext_lookup.get(ext)
+        if ext_id is None:
+            ext_id = self.ext_lookup[ext] = len(self.extensions)
+            self.extensions.append(ext)
+        return ext_id
+
+    def _add(self, parent, entry):
+        i = len(self.names)
+        self.names.append(entry.name)
+        self.parents.append(parent)
+        self.is_dir.append(entry.is_dir)
+        self.alive.append(1)
+        self.sizes.append(entry.size or 0)
+        self.mtimes.append(entry.mtime_ns or 0)
+        self.ext_ids.append(-1 if entry.is_dir else self._ext_id(entry.name))
+        self.children[parent][entry.name] = i
+        if entry.is_dir:
+            self.children[i] = {}
+            self.dir_paths[i] = entry.path
+            self.dir_ids[entry.path] = i
+        return i
+
+    def _filters_at(self, dir_id):
+        if self.filters is None or dir_id == -1:
+            return self.filters
+        return SubtreeFilters(self.filters, self._relpath(dir_id) + '/')
+
+    def _add_tree(self, parent):
+        for dirpath, dirs, files in walk(self.dir_paths[parent], self._filters_at(parent)):
+            dir_id = self.dir_ids[dirpath]
+            for entry in dirs + files:
+                self._add(dir_id, entry)
+
+    def _remove(self, i):
+        self.alive[i] = 0
+        del self.children[self.parents[i]][self.names[i]]
+        if self.is_dir[i]:
+            for child in list(self.children[i].values()):
+                self._remove(child)
+            del self.children[i]
+            del self.dir_ids[self.dir_paths.pop(i)]
+
+    def path(self, i):
+        if self.is_dir[i]:
+            return self.dir_paths[i]
+        parent = self.dir_paths[self.parents[i]]
+        return self.names[i] if parent == '.' else f"{parent.rstrip(os.sep)}{os.sep}{self.names[i]}"
+
+    def entry(self, i):
+        if self.is_dir[i]:
+            return Entry(self.path(i), self.names[i], True, None, None)
+        return Entry(self.path(i), self.names[i], False, self.sizes[i], self.mtimes[i])
+
+    def _relpath(self, i):
+        parts = []
+        while i != -1:
+            parts.append(self.names[i])
+            i = self.parents[i]
+        return '/'.join(reversed(parts))
+
+    def _ext_check(self, filters):
+        # Plain extension filters are decided once per extension id instead of once per file.
+        if type(filters) is not Filters or filters.include_globs is not None or filters.exclude_globs is not None:
+            return None
+        allowed = bytearray(filters.file_ok(f'x{ext}', '') for ext in self.extensions)
+        return lambda i: allowed[self.ext_ids[i]]
+
+    def list_dir(self, path, filters=None):
+        """Return (dir Entries, file Entries) directly under path that pass filters."""
+        with self.lock:
+            dir_id = self.dir_ids.get(os.fspath(Path(path)))
+            if dir_id is None:
+                return [], []
+            reldir = '' if dir_id == -1 else self._relpath(dir_id) + '/'
+            ext_check = self._ext_check(filters)
+            dirs, files = [], []
+            for name, i in self.children[dir_id].items():
+                if self.is_dir[i]:
+                    if filters is None or filters.dir_ok(name, reldir + name):
+                        dirs.append(self.entry(i))
+                elif filters is None or (ext_check(i) if ext_check else filters.file_ok(name, reldir + name)):
+                    files.append(self.entry(i))
+            return dirs, files
+
+    def walk(self, filters=None, top=None):
+        """Like scanner.walk over the snapshot: yield (dirpath, dir Entries, file Entries)."""
+        stack = [self.root if top is None else os.fspath(Path(top))]
+        while stack:
+            dirpath = stack.pop()
+            dirs, files = self.list_dir(dirpath, filters)
+            yield dirpath, dirs, files
+            stack.extend(entry.path for entry in reversed(dirs))
+
+    def refresh_dir(self, path):
+        """Bring the children of one directory in line with the disk; return True if anything changed."""
+        with self.lock:
+            dir_id = self.dir_ids.get(path)
+            if dir_id is None:
+                return False
+            try:
+                _, dirs, files = next(walk(path, self._filters_at(dir_id)))
+            except StopIteration:
+                dirs, files = [], []
+            on_disk = {entry.name: entry for entry in dirs + files}
+            known = self.children[dir_id]
+            changed = False
+            for name in [name for name in known if name not in on_disk]:
+                self._remove(known[name])
+                changed = True
+            for name, entry in on_disk.items():
+                i = known.get(name)
+                if i is not None and self.is_dir[i] != entry.is_dir:
+                    self._remove(i)
+                    i = None
+                if i is None:
+                    i = self._add(dir_id, entry)
+                    if entry.is_dir:
+                        self._add_tree(i)
+                        if self.watcher is not None:
+                            self.watcher.add_tree(i)
+                    changed = True
+                elif not entry.is_dir and (self.sizes[i], self.mtimes[i]) != (entry.size, entry.mtime_ns):
+                    self.sizes[i] = entry.size
+                    self.mtimes[i] = entry.mtime_ns
+                    changed = True
+            if changed:
+                self.version += 1
+            return changed
+
+    def watch(self, interval=POLL_INTERVAL):
+        """Start keeping the snapshot current in a background thread."""
+        if self.watcher is None:
+            watcher = InotifyWatcher(self) if InotifyWatcher.available() else None
+            if watcher is None or not watcher.start():
+                watcher = PollingWatcher(self, interval)
+                watcher.start()
+            self.watcher = watcher
+        return self.watcher
+
+    def close(self):
+        if self.watcher is not None:
+            self.watcher.stop()
+            self.watcher = None
+
+
+class SubtreeFilters:
+    """Checks a walk of one indexed directory against filters as if the walk had started at the index root."""
+
+    def __init__(self, filters, reldir):
+        self.filters = filters
+        self.reldir = reldir
+
+    def dir_ok(self, name, relpath):
+        return self.filters.dir_ok(name, self.reldir + relpath)
+
+    def file_ok(self, name, relpath):
+        return self.filters.file_ok(name, self.reldir + relpath)
+
+
+class PollingWatcher:
+    """Fallback watcher: re-lists every known directory every interval seconds."""
+
+    def __init__(self, index, interval=POLL_INTERVAL):
+        self.index = index
+        self.interval = interval
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+
+    def start(self):
+        self.thread.start()
+        return True
+
+    def add_tree(self, dir_id):
+        pass
+
+    def poll(self):
+        for path in list(self.index.dir_ids):
+            self.index.refresh_dir(path)
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            self.poll()
+
+    def stop(self):
+        self.stopped.set()
+
+
+class InotifyWatcher:
+    """Linux watcher: one inotify watch per directory, events applied as they arrive."""
+
+    libc = None
+
+    @classmethod
+    def available(cls):
+        if not sys.platform.startswith('linux'):
+            return False
+        if cls.libc is None:
+            try:
+                cls.libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+                cls.libc.inotify_init1
+            except (OSError, AttributeError):
+                cls.libc = False
+        return bool(cls.libc)
+
+    def __init__(self, index):
+        self.index = index
+        self.fd = -1
+        self.watches = {}
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+
+    def start(self):
+        """Return False when inotify cannot cover the tree, so the caller can fall back to polling."""
+        self.fd = self.libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            return False
+        with self.index.lock:
+            if not self.add_tree(-1):
+                os.close(self.fd)
+                return False
+        self.thread.start()
+        return True
+
+    def add_tree(self, dir_id):
+        index = self.index
+        pending = [dir_id]
+        while pending:
+            current = pending.pop()
+            path = index.dir_paths[current]
+            wd = self.libc.inotify_add_watch(self.fd, os.fsencode(path), WATCH_MASK)
+            if wd < 0:
+                # Usually fs.inotify.max_user_watches; deleted directories are fine to skip.
+                if ctypes.get_errno() == 28:
+                    return False
+                continue
+            self.watches[wd] = path
+            pending.extend(i for i in index.children[current].values() if index.is_dir[i])
+        return True
+
+    def run(self):
+        while not self.stopped.is_set():
+            ready, _, _ = select.select([self.fd], [], [], 0.5)
+            if not ready:
+                continue
+            try:
+                data = os.read(self.fd, 65536)
+            except BlockingIOError:
+                continue
+            except OSError:
+                break
+            dirty = set()
+            offset = 0
+            while offset < len(data):
+                wd, mask, _, length = EVENT_HEADER.unpack_from(data, offset)
+                offset += EVENT_HEADER.size + length
+                if mask & IN_Q_OVERFLOW:
+                    dirty.update(self.index.dir_ids)
+                elif wd in self.watches:
+                    dirty.add(self.watches[wd])
+            for path in dirty:
+                self.index.refresh_dir(path)
+
+    def stop(self):
+        self.stopped.set()
+        if self.thread.is_alive():
+            self.thread.join()
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
@@ -4,10 +4,17 @@ import os
 from pathlib import Path
 import pyperclip
 from copy_files import copy_files_to_clipboard
+from file_index import FileIndex
+from scanner import suffix
 import tkinter as tk
 from tkinter import ttk
 from pathlib import Path
 import os
+import threading
+
+INDEX_POLL_MS = 500
+# Bursts of changes (an editor save, a build writing __pycache__) are redrawn once they settle.
+INDEX_DEBOUNCE_MS = 300
 
 class Filter:
     def __init__(self):
@@ -40,8 +47,16 @@ class FileProcessorApp(tk.Tk):
         self.file_filter = Filter()
         self.directory_filter = Filter()
         self.extension_filter = Filter()
+        # Filter changes re-render from this snapshot instead of rescanning the disk.
+        # It is built in the background; the tree is drawn once it is ready.
+        self.index = FileIndex(Path().resolve())
+        self.index_version = None
+        self.pending_refresh = None
+        self.item_paths = {}
+        threading.Thread(target=self.build_index, daemon=True).start()
 
         self.create_widgets()
+        self.after(INDEX_POLL_MS, self.poll_index)
 
     def create_widgets(self):
         self.tree_frame = ttk.Frame(self)
@@ -63,8 +78,6 @@ class FileProcessorApp(tk.Tk):
         self.btn_process = ttk.Button(self.options_frame, text="Process Selected", command=self.process_selected)
         self.btn_process.grid(row=4, column=1, columnspan=2)
 
-        self.populate_tree(Path().resolve())
-
     def setup_filter_widgets(self, label_text, command):
         base_row = 0 if "Include" in label_text else 3
         lbl_frame = ttk.Label(self.options_frame, text=f"{label_text} Filters:")
@@ -82,20 +95,61 @@ class FileProcessorApp(tk.Tk):
         self.file_filter.update(self.include_file_var.get(), self.exclude_file_var.get())
         self.directory_filter.update(self.include_dir_var.get(), self.exclude_dir_var.get())
         self.extension_filter.update(self.include_ext_var.get(), self.exclude_ext_var.get(), dot_prefix=True)
-        self.populate_tree(Path().resolve())
+        if self.index.ready.is_set():
+            self.populate_tree(self.index.root)
+
+    def build_index(self):
+        self.index.build()
+        self.index.watch()
 
     def populate_tree(self, start_path):
+        # Open folders and the selection survive the rebuild, matched by path.
+        open_paths = {path for item, path in self.item_paths.items() if self.tree.item(item, 'open')}
+        selected = {self.item_paths[item] for item in self.tree.selection() if item in self.item_paths}
         for i in self.tree.get_children():
             self.tree.delete(i)
-        self.process_directory('', start_path)
-
-    def process_directory(self, parent, path):
-        for p in path.iterdir():
-            if p.is_dir() and self.directory_filter.match(p.name):
-                oid = self.tree.insert(parent, 'end', text=p.name, open=False, values=(p.stat().st_size, "directory"))
-                self.process_directory(oid, p)
-            elif p.is_file() and self.file_filter.match(p.name, p.suffix):
-                self.tree.insert(parent, 'end', text=p.name, open=False, values=(p.stat().st_size, "file"))
+        self.item_paths = {}
+        self.index_version = self.index.version
+        self.process_directory('', start_path, open_paths)
+        reselect = [item for item, path in self.item_paths.items() if path in selected]
+        if reselect:
+            self.tree.selection_set(reselect)
+
+    def poll_index(self):
+        if self.index.ready.is_set() and self.index.version != self.index_version:
+            if self.index_version is None:
+                self.populate_tree(self.index.root)
+            else:
+                self.schedule_refresh()
+        self.after(INDEX_POLL_MS, self.poll_index)
+
+    def schedule_refresh(self):
+        if self.pending_refresh is not None:
+            self.after_cancel(self.pending_refresh)
+        self.index_version = self.index.version
+        self.pending_refresh = self.after(INDEX_DEBOUNCE_MS, self.refresh_tree)
+
+    def refresh_tree(self):
+        self.pending_refresh = None
+        self.populate_tree(self.index.root)
+
+    def process_directory(self, parent, path, open_paths=()):
+        nodes = {os.fspath(path): parent}
+        for root, dirs, files in self.index.walk(self, path):
+            oid = nodes.pop(root)
+            for entry in dirs:
+                item = self.tree.insert(oid, 'end', text=entry.name, open=entry.path in open_paths, values=("", "directory"))
+                nodes[entry.path] = item
+                self.item_paths[item] = entry.path
+            for entry in files:
+                item = self.tree.insert(oid, 'end', text=entry.name, open=False, values=(entry.size, "file"))
+                self.item_paths[item] = entry.path
+
+    def dir_ok(self, name, relpath):
+        return self.directory_filter.match(name)
+
+    def file_ok(self, name, relpath):
+        return self.file_filter.match(name, suffix(name))
 
     def process_selected(self):
         selected_items = self.tree.selection()
@@ -1,9 +1,21 @@
 import os
+import queue
+import threading
+import time
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
-from pathlib import Path
-import pyperclip
-from copy_files import process_content
+from copy_files import iter_directory_entries, process_files
+from file_index import FileIndex
+from scanner import Filters, walk
+from sinks import clipboard_sink
+
+POLL_INTERVAL_MS = 50
+FILTER_DEBOUNCE_MS = 300
+# Tree rows inserted per poll, so huge directories fill in without freezing the window.
+INSERT_BATCH = 500
+PLACEHOLDER = "Loading..."
+# Smaller runs are processed in the worker thread itself; a process pool would only add startup time.
+PARALLEL_MIN_FILES = 32
 
 class FileProcessorApp(tk.Tk):
     def __init__(self):
@@ -14,7 +26,20 @@ class FileProcessorApp(tk.Tk):
 
         self.selected_files = []
         self.directory = None
+        self.filters = None
+        # Bumped on every rebuild; listings from an older generation are dropped.
+        self.scan_generation = 0
+        self.scan_results = queue.Queue()
+        self.unloaded = {}
+        self.pending_update = None
+        # Listings come from this snapshot once it is built; until then they read the disk.
+        self.index = None
+        self.index_version = None
+        self.reopen = set()
+        self.cancel_event = None
+        self.progress_updates = queue.Queue()
         self.init_ui()
+        self.after(POLL_INTERVAL_MS, self.poll_scan_results)
 
     def init_ui(self):
         self.create_menu()
@@ -41,6 +66,7 @@ class FileProcessorApp(tk.Tk):
         self.tree.pack(fill=tk.BOTH, expand=True)
         
         self.tree.bind("<ButtonRelease-1>", self.on_tree_select)
+        self.tree.bind("<<TreeviewOpen>>", self.on_tree_open)
 
     def create_filters(self):
         filter_frame = tk.Frame(self)
@@ -49,22 +75,22 @@ class FileProcessorApp(tk.Tk):
         tk.Label(filter_frame, text="Include Extensions:").grid(row=0, column=0, padx=5, pady=5)
         self.include_ext_entry = tk.Entry(filter_frame)
         self.include_ext_entry.grid(row=0, column=1, padx=5, pady=5)
-        self.include_ext_entry.bind("<KeyRelease>", lambda event: self.update_treeview())
+        self.include_ext_entry.bind("<KeyRelease>", lambda event: self.schedule_update())
 
         tk.Label(filter_frame, text="Exclude Extensions:").grid(row=0, column=2, padx=5, pady=5)
         self.exclude_ext_entry = tk.Entry(filter_frame)
         self.exclude_ext_entry.grid(row=0, column=3, padx=5, pady=5)
-        self.exclude_ext_entry.bind("<KeyRelease>", lambda event: self.update_treeview())
+        self.exclude_ext_entry.bind("<KeyRelease>", lambda event: self.schedule_update())
 
         tk.Label(filter_frame, text="Include Directories:").grid(row=1, column=0, padx=5, pady=5)
         self.include_dirs_entry = tk.Entry(filter_frame)
         self.include_dirs_entry.grid(row=1, column=1, padx=5, pady=5)
-        self.include_dirs_entry.bind("<KeyRelease>", lambda event: self.update_treeview())
+        self.include_dirs_entry.bind("<KeyRelease>", lambda event: self.schedule_update())
 
         tk.Label(filter_frame, text="Exclude Directories:").grid(row=1, column=2, padx=5, pady=5)
         self.exclude_dirs_entry = tk.Entry(filter_frame)
         self.exclude_dirs_entry.grid(row=1, column=3, padx=5, pady=5)
-        self.exclude_dirs_entry.bind("<KeyRelease>", lambda event: self.update_treeview())
+        self.exclude_dirs_entry.bind("<KeyRelease>", lambda event: self.schedule_update())
 
     def create_options(self):
         option_frame = tk.Frame(self)
@@ -74,16 +100,63 @@ class FileProcessorApp(tk.Tk):
         tk.Checkbutton(option_frame, text="Modify Python Files", variable=self.modify_python_var).pack(anchor=tk.W)
 
     def create_run_button(self):
-        run_button = tk.Button(self, text="Run", command=self.run_processing)
-        run_button.pack(pady=10)
+        run_frame = tk.Frame(self)
+        run_frame.pack(fill=tk.X, padx=10, pady=10)
+
+        self.run_button = tk.Button(run_frame, text="Run", command=self.run_processing)
+        self.run_button.pack(side=tk.LEFT)
+        self.cancel_button = tk.Button(run_frame, text="Cancel", command=self.cancel_processing, state=tk.DISABLED)
+        self.cancel_button.pack(side=tk.LEFT, padx=5)
+        self.progress_bar = ttk.Progressbar(run_frame, mode="determinate", maximum=1)
+        self.progress_bar.pack(side=tk.LEFT, fill=tk.X, expand=True, padx=5)
+        self.progress_label = tk.Label(run_frame, text="")
+        self.progress_label.pack(side=tk.LEFT)
 
     def open_directory(self):
         directory = filedialog.askdirectory()
         if directory:
             self.directory = directory
+            if self.index is not None:
+                self.index.close()
+            self.index = FileIndex(directory)
+            self.index_version = None
+            threading.Thread(target=self.build_index, args=(self.index,), daemon=True).start()
             self.update_treeview()
 
+    def build_index(self, index):
+        index.build()
+        if index is self.index:
+            index.watch()
+
+    def check_index(self):
+        # The tree is rebuilt from the index when the watcher reports a change, keeping open folders open.
+        index = self.index
+        if index is None or not index.ready.is_set() or index.version == self.index_version:
+            return
+        first = self.index_version is None
+        self.index_version = index.version
+        if not first:
+            self.reopen = self.open_paths()
+            self.update_treeview()
+
+    def open_paths(self, node=""):
+        paths = set()
+        for item in self.tree.get_children(node):
+            if self.tree.item(item, "open") and item not in self.unloaded:
+                paths.add(self.tree.item(item, "values")[0])
+                paths |= self.open_paths(item)
+        return paths
+
+    def schedule_update(self):
+        if self.pending_update is not None:
+            self.after_cancel(self.pending_update)
+        self.pending_update = self.after(FILTER_DEBOUNCE_MS, self.update_treeview)
+
     def update_treeview(self):
+        self.pending_update = None
+        if not self.directory:
+            return
+
         include_ext = self.include_ext_entry.get().split() if self.include_ext_entry.get() else None
         exclude_ext = self.exclude_ext_entry.get().split() if self.exclude_ext_entry.get() else None
         include_dirs = self.include_dirs_entry.get().split() if self.include_dirs_entry.get() else None
@@ -95,43 +168,59 @@ class FileProcessorApp(tk.Tk):
         self.populate_tree(self.directory, include_ext, exclude_ext, include_dirs, exclude_dirs)
 
     def populate_tree(self, directory, include_ext, exclude_ext, include_dirs, exclude_dirs):
-        def should_include_dir(d):
-            if include_dirs and d not in include_dirs:
-                return False
-            if exclude_dirs and d in exclude_dirs:
-                return False
-            return True
-
-        for root, dirs, files in os.walk(directory):
-            dirs[:] = [d for d in dirs if should_include_dir(d)]
-            filtered_files = [f for f in files if self.should_include_file(f, include_ext, exclude_ext)]
-
-            if filtered_files or dirs:
-                path = root.replace(directory, "").lstrip(os.sep)
-                parent = ""
-                if path:
-                    parent = self.tree.insert("", "end", text=path, open=True)
-                self.insert_items(parent, root, filtered_files, include_ext, exclude_ext)
-    
-    def should_include_file(self, file, include_ext, exclude_ext):
-        suffix = Path(file).suffix
-        if include_ext and suffix not in include_ext:
-            return False
-        if exclude_ext and suffix in exclude_ext:
-            return False
-        return True
-
-    def insert_items(self, parent, path, files, include_ext, exclude_ext):
-        for item in os.listdir(path):
-            full_path = os.path.join(path, item)
-            if os.path.isdir(full_path):
-                filtered_files = [f for f in os.listdir(full_path) if self.should_include_file(f, include_ext, exclude_ext)]
-                if filtered_files or [d for d in os.listdir(full_path) if os.path.isdir(os.path.join(full_path, d))]:
-                    node = self.tree.insert(parent, "end", text=item, values=(full_path,))
-                    self.insert_items(node, full_path, filtered_files, include_ext, exclude_ext)
-            else:
-                if item in files:
-                    self.tree.insert(parent, "end", text=item, values=(full_path,))
+        self.scan_generation += 1
+        self.unloaded = {}
+        self.filters = Filters(include_ext, exclude_ext, include_dirs, exclude_dirs)
+        self.request_listing("", directory)
+
+    def request_listing(self, node, path):
+        generation = self.scan_generation
+        threading.Thread(target=self.list_directory, args=(generation, node, path, self.filters), daemon=True).start()
+
+    def list_directory(self, generation, node, path, filters):
+        # Runs on a worker thread: only scans and hands the result to the Tk thread.
+        if generation != self.scan_generation:
+            return
+        index = self.index
+        if index is not None and index.ready.is_set():
+            dirs, files = index.list_dir(path, filters)
+        else:
+            _, dirs, files = next(walk(path, filters), (path, [], []))
+        self.scan_results.put((generation, node, [(entry, True) for entry in dirs] + [(entry, False) for entry in files]))
+
+    def poll_scan_results(self):
+        budget = INSERT_BATCH
+        try:
+            while budget > 0:
+                generation, node, entries = self.scan_results.get_nowait()
+                if generation != self.scan_generation or (node and not self.tree.exists(node)):
+                    continue
+                if len(entries) > budget:
+                    # Finish the rest on a later poll.
+                    entries, rest = entries[:budget], entries[budget:]
+                    self.scan_results.put((generation, node, rest))
+                for entry, is_dir in entries:
+                    item = self.tree.insert(node, "end", text=entry.name, values=(entry.path,))
+                    if is_dir and entry.path in self.reopen:
+                        self.reopen.discard(entry.path)
+                        self.tree.item(item, open=True)
+                        self.request_listing(item, entry.path)
+                    elif is_dir:
+                        self.unloaded[item] = entry.path
+                        self.tree.insert(item, "end", text=PLACEHOLDER)
+                budget -= len(entries)
+        except queue.Empty:
+            pass
+        self.check_index()
+        self.after(POLL_INTERVAL_MS, self.poll_scan_results)
+
+    def on_tree_open(self, event):
+        node = self.tree.focus()
+        path = self.unloaded.pop(node, None)
+        if path is None:
+            return
+        self.tree.delete(*self.tree.get_children(node))
+        self.request_listing(node, path)
 
     def on_tree_select(self, event):
         selected_items = self.tree.selection()
@@ -141,6 +230,8 @@ class FileProcessorApp(tk.Tk):
         if not self.selected_files:
             messagebox.showwarning("No Selection", "Please select at least one file or directory.")
             return
+        if self.cancel_event is not None:
+            return
 
         include_ext = self.include_ext_entry.get().split() if self.include_ext_entry.get() else None
         exclude_ext = self.exclude_ext_entry.get().split() if self.exclude_ext_entry.get() else None
@@ -148,41 +239,101 @@ class FileProcessorApp(tk.Tk):
         exclude_dirs = self.exclude_dirs_entry.get().split() if self.exclude_dirs_entry.get() else None
         modify_python = self.modify_python_var.get()
 
-        clipboard_content = ""
-        for path in self.selected_files:
-            if os.path.isfile(path):
-                clipboard_content += self.process_file(path, modify_python)
-            elif os.path.isdir(path):
-                clipboard_content += self.process_directory(path, include_ext, exclude_ext, include_dirs, exclude_dirs, modify_python)
-
-        pyperclip.copy(clipboard_content.strip())
-        messagebox.showinfo("Processing Complete", "Selected files have been processed and copied to clipboard.")
-
-    def process_file(self, file_path, modify_python):
-        with open(file_path, 'r', encoding='utf-8') as f:
-            content = f.read()
-
-        modified_content = process_content(content, modify_python and Path(file_path).suffix == '.py')
-        return f"# File: {file_path}\n{modified_content}\n\n"
-
-    def process_directory(self, directory, include_ext, exclude_ext, include_dirs, exclude_dirs, modify_python):
-        clipboard_content = ""
-        for root, dirs, files in os.walk(directory):
-            if include_dirs:
-                dirs[:] = [d for d in dirs if d in include_dirs]
-            if exclude_dirs:
-                dirs[:] = [d for d in dirs if d not in exclude_dirs]
-
-            for file in files:
-                file_path = Path(root) / file
-                if include_ext and not file_path.suffix in include_ext:
-                    continue
-                if exclude_ext and file_path.suffix in exclude_ext:
-                    continue
-
-                clipboard_content += self.process_file(file_path, modify_python)
+        self.cancel_event = threading.Event()
+        self.run_button.config(state=tk.DISABLED)
+        self.cancel_button.config(state=tk.NORMAL)
+        self.progress_bar.config(value=0)
+        self.progress_label.config(text="Scanning...")
+        args = (list(self.selected_files), include_ext, exclude_ext, include_dirs, exclude_dirs, modify_python, self.cancel_event)
+        threading.Thread(target=self.process_selection, args=args, daemon=True).start()
+        self.after(POLL_INTERVAL_MS, self.poll_progress)
+
+    def cancel_processing(self):
+        if self.cancel_event is not None:
+            self.cancel_event.set()
+            self.progress_label.config(text="Cancelling...")
+
+    def process_selection(self, paths, include_ext, exclude_ext, include_dirs, exclude_dirs, modify_python, cancel_event):
+        # Runs on a worker thread and reports to the Tk thread through progress_updates only.
+        try:
+            sizes = {}
+            for path in paths:
+                if os.path.isfile(path):
+                    sizes[path] = os.path.getsize(path)
+                elif os.path.isdir(path):
+                    for entry in iter_directory_entries(path, include_ext, exclude_ext, include_dirs, exclude_dirs):
+                        # Checked per entry, so cancelling does not wait for a huge directory to be walked.
+                        if cancel_event.is_set():
+                            break
+                        sizes[entry.path] = entry.size
+                if cancel_event.is_set():
+                    self.progress_updates.put(("done", None))
+                    return
+
+            total_files, total_bytes = len(sizes), sum(sizes.values())
+            jobs = 0 if total_files >= PARALLEL_MIN_FILES else 1
+            chunks, done_files, done_bytes = [], 0, 0
+            started = time.monotonic()
+            results = process_files(list(sizes), modify_python, jobs)
+            try:
+                for file_path, chunk in results:
+                    if cancel_event.is_set():
+                        self.progress_updates.put(("done", None))
+                        return
+                    chunks.append(chunk)
+                    done_files += 1
+                    done_bytes += sizes[file_path]
+                    elapsed = time.monotonic() - started
+                    eta = elapsed * (total_bytes - done_bytes) / done_bytes if done_bytes else None
+                    self.progress_updates.put(("progress", (done_files, total_files, done_bytes, total_bytes, eta)))
+            finally:
+                results.close()
+            self.progress_updates.put(("done", "".join(chunks).strip()))
+        except Exception as e:
+            self.progress_updates.put(("error", str(e)))
+
+    def poll_progress(self):
+        # Only the latest progress report is drawn; the bar would not show the ones in between.
+        progress, result = None, None
+        try:
+            while result is None:
+                kind, value = self.progress_updates.get_nowait()
+                if kind == "progress":
+                    progress = value
+                else:
+                    result = (kind, value)
+        except queue.Empty:
+            pass
+
+        if progress is not None:
+            done_files, total_files, done_bytes, total_bytes, eta = progress
+            self.progress_bar.config(value=done_bytes / total_bytes if total_bytes else done_files / total_files)
+            eta_text = f", {eta:.0f}s left" if eta is not None else ""
+            self.progress_label.config(text=f"{done_files}/{total_files} files, "
+                                            f"{done_bytes / 1e6:.1f}/{total_bytes / 1e6:.1f} MB{eta_text}")
+        if result is None:
+            self.after(POLL_INTERVAL_MS, self.poll_progress)
+            return
 
-        return clipboard_content
+        self.cancel_event = None
+        self.run_button.config(state=tk.NORMAL)
+        self.cancel_button.config(state=tk.DISABLED)
+        kind, value = result
+        if kind == "error":
+            self.progress_label.config(text="Failed")
+            messagebox.showerror("Processing Failed", value)
+        elif value is None:
+            self.progress_label.config(text="Cancelled")
+        else:
+            self.progress_bar.config(value=1)
+            self.progress_label.config(text="Done")
+            try:
+                with clipboard_sink() as sink:
+                    sink.write(value)
+            except (OSError, RuntimeError) as e:
+                messagebox.showerror("Clipboard Failed", str(e))
+                return
+            messagebox.showinfo("Processing Complete", f"Selected files have been processed and {sink.message}.")
 
 if __name__ == "__main__":
     app = FileProcessorApp()
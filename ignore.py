@@ -0,0 +1,197 @@
+import os
+import re
+
+# Read in every directory alongside .gitignore, for rules that only apply to dumps.
+PROJECT_IGNORE_FILE = '.copyignore'
+IGNORE_FILES = ('.gitignore', PROJECT_IGNORE_FILE)
+
+
+def translate(pattern):
+    """Translate the glob part of a .gitignore pattern into a regex fragment."""
+    out = []
+    i, n = 0, len(pattern)
+    while i < n:
+        c = pattern[i]
+        if c == '*':
+            if pattern.startswith('**', i):
+                at_start = i == 0 or pattern[i - 1] == '/'
+                at_end = i + 2 == n or pattern[i + 2] == '/'
+                if at_start and at_end:
+                    if i + 2 == n:
+                        out.append('.*')
+                        i += 2
+                    else:
+                        out.append('(?:.*/)?')
+                        i += 3
+                    continue
+            out.append('[^/]*')
+        elif c == '?':
+            out.append('[^/]')
+        elif c == '[':
+            j = pattern.find(']', i + 2 if pattern.startswith('[!', i) or pattern.startswith('[]', i) else i + 1)
+            if j == -1:
+                out.append(re.escape(c))
+            else:
+                body = pattern[i + 1:j].replace('\\', '\\\\')
+                if body.startswith('!'):
+                    body = '^' + body[1:]
+                out.append(f'[{body}]')
+                i = j
+        elif c == '\\' and i + 1 < n:
+            i += 1
+            out.append(re.escape(pattern[i]))
+        else:
+            out.append(re.escape(c))
+        i += 1
+    return ''.join(out)
+
+
+class IgnoreFile:
+    """The patterns of one ignore file, compiled into one regex for files and one for directories.
+
+    Patterns are joined in reverse order with a named group each, so the first
+    alternative that matches is the last matching line of the file, which is
+    the one git honours.
+    """
+
+    def __init__(self, lines):
+        self.negated = {}
+        file_groups, dir_groups = [], []
+        for index, line in enumerate(lines):
+            line = line.rstrip('\n')
+            if line.endswith(' ') and not line.endswith('\\ '):
+                line = line.rstrip(' ')
+            if not line or line.startswith('#'):
+                continue
+            negate = line.startswith('!')
+            if negate:
+                line = line[1:]
+            elif line.startswith(('\\!', '\\#')):
+                line = line[1:]
+            dir_only = line.endswith('/')
+            line = line.rstrip('/')
+            if not line:
+                continue
+            anchored = '/' in line
+            line = line.lstrip('/')
+            regex = translate(line) if anchored else f'(?:.*/)?{translate(line)}'
+            group = f'(?P<p{index}>{regex})'
+            self.negated[f'p{index}'] = negate
+            dir_groups.append(group)
+            if not dir_only:
+                file_groups.append(group)
+
+        self.file_regex = self._compile(file_groups)
+        self.dir_regex = self._compile(dir_groups)
+
+    @staticmethod
+    def _compile(groups):
+        if not groups:
+            return None
+        return re.compile(f"(?:{'|'.join(reversed(groups))})\\Z")
+
+    @classmethod
+    def load(cls, path):
+        try:
+            with open(path, 'r', encoding='utf-8', errors='replace') as f:
+                return cls(f.readlines())
+        except OSError:
+            return None
+
+    def match(self, relpath, is_dir):
+        """Return True (ignored), False (re-included by '!') or None (no pattern matched)."""
+        regex = self.dir_regex if is_dir else self.file_regex
+        if regex is None:
+            return None
+        match = regex.match(relpath)
+        if match is None:
+            return None
+        return not self.negated[match.lastgroup]
+
+
+def find_git_root(path):
+    path = os.path.abspath(path)
+    while True:
+        if os.path.exists(os.path.join(path, '.git')):
+            return path
+        parent = os.path.dirname(path)
+        if parent == path:
+            return None
+        path = parent
+
+
+class IgnoreFilters:
+    """Wraps scanner.Filters and additionally skips what git would ignore.
+
+    Honours .gitignore and .copyignore in the scanned tree and in its parents up
+    to the repository root, plus .git/info/exclude. Each directory's ignore
+    files are read once, the first time one of its entries is checked, and
+    ignored directories are rejected by dir_ok so walk never lists them.
+    """
+
+    def __init__(self, top, filters=None):
+        self.top = os.path.abspath(top)
+        self.filters = filters
+        self.chains = {'': self._root_chain()}
+
+    def _root_chain(self):
+        # Chain items are (ignore file, strip, prepend): the path relative to the
+        # file's directory is prepend + relpath[strip:].
+        chain = []
+        git_root = find_git_root(self.top)
+        ancestors = []
+        if git_root is not None:
+            path = self.top
+            while path != git_root:
+                path = os.path.dirname(path)
+                ancestors.append(path)
+            info_exclude = IgnoreFile.load(os.path.join(git_root, '.git', 'info', 'exclude'))
+            if info_exclude is not None:
+                chain.append((info_exclude, 0, self._prefix(git_root)))
+
+        for directory in reversed(ancestors):
+            chain.extend(self._load_dir(directory, 0, self._prefix(directory)))
+        chain.extend(self._load_dir(self.top, 0, ''))
+        return tuple(chain)
+
+    def _prefix(self, directory):
+        rel = os.path.relpath(self.top, directory).replace(os.sep, '/')
+        return '' if rel == '.' else rel + '/'
+
+    @staticmethod
+    def _load_dir(directory, strip, prepend):
+        loaded = []
+        for name in IGNORE_FILES:
+            ignore_file = IgnoreFile.load(os.path.join(directory, name))
+            if ignore_file is not None:
+                loaded.append((ignore_file, strip, prepend))
+        return loaded
+
+    def _chain(self, reldir):
+        chain = self.chains.get(reldir)
+        if chain is None:
+            parent = reldir.rpartition('/')[0]
+            own = self._load_dir(os.path.join(self.top, reldir), len(reldir) + 1, '')
+            chain = self._chain(parent) + tuple(own)
+            self.chains[reldir] = chain
+        return chain
+
+    def ignored(self, relpath, is_dir):
+        # Deeper ignore files take precedence, so check the chain from the end.
+        for ignore_file, strip, prepend in reversed(self._chain(relpath.rpartition('/')[0])):
+            result = ignore_file.match(prepend + relpath[strip:], is_dir)
+            if result is not None:
+                return result
+        return False
+
+    def dir_ok(self, name, relpath):
+        if name == '.git':
+            return False
+        if self.filters is not None and not self.filters.dir_ok(name, relpath):
+            return False
+        return not self.ignored(relpath, True)
+
+    def file_ok(self, name, relpath):
+        if self.filters is not None and not self.filters.file_ok(name, relpath):
+            return False
+        return not self.ignored(relpath, False)
@@ -0,0 +1,118 @@
+import os
+import stat
+import sys
+
+from scanner import Entry, Filters, path_allowed, scan
+
+GLOB_CHARS = frozenset('*?[')
+
+
+def read_file_list(source):
+    """Return the paths in a --files_from list ('-' for stdin).
+
+    The list is NUL-separated if it contains a NUL byte, as printed by
+    `git ls-files -z` or `fd -0`, and one path per line otherwise.
+    """
+    if source == '-':
+        data = sys.stdin.buffer.read()
+    else:
+        with open(source, 'rb') as f:
+            data = f.read()
+    if b'\0' in data:
+        names = data.split(b'\0')
+    else:
+        names = [name.rstrip(b'\r') for name in data.split(b'\n')]
+    return [os.fsdecode(name) for name in names if name]
+
+
+def is_pattern(source):
+    """Whether source is a glob pattern rather than the name of an existing path."""
+    return bool(GLOB_CHARS.intersection(source)) and not os.path.exists(source)
+
+
+def expand_sources(sources):
+    """Yield the paths named by sources; patterns that are not existing paths are expanded as globs.
+
+    Sources that name nothing are reported on stderr and skipped.
+    """
+    import glob
+    for source in sources:
+        if is_pattern(source):
+            matches = sorted(glob.glob(source, recursive=True))
+            if not matches:
+                print(f"No files match {source}", file=sys.stderr)
+            yield from matches
+        elif os.path.exists(source):
+            yield source
+        else:
+            print(f"No such file or directory: {source}", file=sys.stderr)
+
+
+def listed_relpath(path, cwd):
+    """path relative to cwd, '/'-separated, or None when it lies outside cwd."""
+    try:
+        relpath = os.path.relpath(os.path.abspath(path), cwd)
+    except ValueError:
+        # A different drive on Windows.
+        return None
+    if relpath == os.pardir or relpath.startswith(os.pardir + os.sep):
+        return None
+    return relpath.replace(os.sep, '/')
+
+
+def file_entry(path):
+    """Entry for a regular file, or None if path is missing or not a file."""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    if not stat.S_ISREG(st.st_mode):
+        return None
+    return Entry(path, os.path.basename(path), False, st.st_size, st.st_mtime_ns)
+
+
+def iter_input_entries(sources, file_list=(), include_ext=None, exclude_ext=None, include_dirs=None, exclude_dirs=None, include_globs=None, exclude_globs=None, gitignore=False):
+    """Yield one Entry per distinct file named by sources and file_list, in order of first appearance.
+
+    Directories among sources are walked with the filters. Files named in
+    sources are taken as given, while files from file_list must pass the
+    filters with their path relative to the working directory; listed files
+    outside it are taken as given too. Paths that refer to the same file by
+    different spellings are only yielded once, and missing files are
+    skipped.
+    """
+    filters = Filters(include_ext, exclude_ext, include_dirs, exclude_dirs, include_globs, exclude_globs)
+    seen = set()
+
+    def first_time(path):
+        key = os.path.normcase(os.path.abspath(path))
+        if key in seen:
+            return False
+        seen.add(key)
+        return True
+
+    for path in expand_sources(sources):
+        if os.path.isdir(path):
+            root_filters = filters
+            if gitignore:
+                from ignore import IgnoreFilters
+                root_filters = IgnoreFilters(path, filters)
+            for entry in scan(path, root_filters):
+                if first_time(entry.path):
+                    yield entry
+        elif first_time(path):
+            entry = file_entry(path)
+            if entry is not None:
+                yield entry
+
+    if gitignore and file_list:
+        from ignore import IgnoreFilters
+        filters = IgnoreFilters('.', filters)
+    cwd = os.getcwd()
+    for path in file_list:
+        relpath = listed_relpath(path, cwd)
+        if (relpath is not None and not path_allowed(filters, relpath)) or not first_time(path):
+            continue
+        entry = file_entry(path)
+        if entry is not None:
+            yield entry
@@ -0,0 +1,172 @@
+import re
+
+# A heredoc start such as <<EOF, <<-'EOF' or << "END" (but not a <<< here-string).
+HEREDOC = re.compile(r'''(?<!<)<<(?!<)(-?)[ \t]*(['"]?)([A-Za-z_][\w-]*)\2''')
+# A YAML block scalar indicator ('|', '>-', '|2' ...) ending a line, optionally before a comment.
+BLOCK_SCALAR = re.compile(r'(?:^|[\s:-])[|>][-+0-9]*[ \t]*(?:#.*)?$')
+
+# Quotes only open a string at the start of a word, so "don't" in a plain YAML value does not.
+QUOTE_AFTER = ' \t:=[{(,-$'
+
+COMMENT_STYLES = {
+    '.js': 'c', '.jsx': 'c', '.mjs': 'c', '.cjs': 'c', '.ts': 'c', '.tsx': 'c', '.go': 'c',
+    '.sh': 'hash', '.bash': 'hash', '.zsh': 'hash', '.yaml': 'hash', '.yml': 'hash',
+}
+
+
+def release(held, line):
+    """Yield line, after the blank lines held before it; a blank line is held instead."""
+    if not line.strip():
+        held.append(line)
+        return
+    yield from held
+    held.clear()
+    yield line
+
+
+def c_scan(line, quote, in_block):
+    """Return the (open quote, inside a block comment) state at the end of line, starting from the given state.
+
+    Only a template literal, or a '"' or "'" string whose line ends in a
+    backslash, stays open past the end of a line.
+    """
+    i, n = 0, len(line)
+    while i < n:
+        if in_block:
+            end = line.find('*/', i)
+            if end == -1:
+                return quote, True
+            i, in_block = end + 2, False
+            continue
+        char = line[i]
+        if quote is not None:
+            if char == '\\':
+                if i == n - 1:
+                    return quote, False
+                i += 2
+                continue
+            if char == quote:
+                quote = None
+        elif char in '"\'`':
+            quote = char
+        elif line.startswith('//', i):
+            break
+        elif line.startswith('/*', i):
+            in_block = True
+            i += 2
+            continue
+        i += 1
+    return (quote if quote == '`' else None), in_block
+
+
+def c_comment_lines(lines):
+    """Yield lines without whole-line '//' and '/* */' comments or blank lines, following strings and comments across lines."""
+    held = []               # blank lines inside a string or comment, kept only if something follows
+    comment = None          # lines of a whole-line /* comment whose end is still to come
+    quote, in_block = None, False
+    for line in lines:
+        stripped = line.strip()
+        if comment is not None:
+            comment.append(line)
+            end = line.find('*/')
+            if end == -1:
+                continue
+            if line[end + 2:].strip():
+                # Code follows the comment, so it is kept as written.
+                for kept in comment:
+                    yield from release(held, kept)
+                quote, in_block = c_scan(line[end + 2:], None, False)
+            comment = None
+            continue
+        if quote is not None or in_block:
+            yield from release(held, line)
+            quote, in_block = c_scan(line, quote, in_block)
+            continue
+        if not stripped:
+            continue
+        if stripped.startswith('//') and not stripped.startswith(('///', '//go:')):
+            continue
+        if stripped.startswith('/*'):
+            end = stripped.find('*/', 2)
+            if end == -1:
+                comment = [line]
+                continue
+            if not stripped[end + 2:].strip():
+                continue
+        yield from release(held, line)
+        quote, in_block = c_scan(line, None, False)
+
+
+def hash_scan(line, quote):
+    """Return (index of the comment on line or -1, quote still open at its end) for shell and YAML."""
+    i = 0
+    while i < len(line):
+        char = line[i]
+        if quote is None:
+            if char == '#' and (i == 0 or line[i - 1] in ' \t'):
+                return i, None
+            if char in '"\'' and (i == 0 or line[i - 1] in QUOTE_AFTER):
+                quote = char
+            elif char == '\\':
+                i += 1
+        elif char == quote:
+            quote = None
+        elif char == '\\' and quote == '"':
+            i += 1
+        i += 1
+    return -1, quote
+
+
+def hash_comment_lines(lines):
+    """Yield lines without whole-line '#' comments or blank lines, keeping quoted strings, heredocs and YAML block scalars."""
+    held = []
+    quote = None
+    heredoc = None          # (terminator, strip leading tabs) while inside a heredoc
+    block_indent = None     # indent of the line that opened a YAML block scalar
+    for line in lines:
+        stripped = line.lstrip()
+        if heredoc is not None:
+            yield from release(held, line)
+            terminator, tabs = heredoc
+            if (line.lstrip('\t') if tabs else line) == terminator:
+                heredoc = None
+            continue
+        if block_indent is not None:
+            if not stripped or len(line) - len(stripped) > block_indent:
+                yield from release(held, line)
+                continue
+            block_indent = None
+        if quote is not None:
+            yield from release(held, line)
+            _, quote = hash_scan(line, quote)
+            continue
+        if not stripped or (stripped[0] == '#' and not stripped.startswith('#!')):
+            continue
+        yield from release(held, line)
+        comment, quote = hash_scan(line, None)
+        code = line if comment == -1 else line[:comment]
+        match = HEREDOC.search(code)
+        if match is not None:
+            heredoc = (match.group(3), bool(match.group(1)))
+        elif BLOCK_SCALAR.search(line):
+            block_indent = len(line) - len(stripped)
+
+
+COMMENT_FILTERS = {'c': c_comment_lines, 'hash': hash_comment_lines}
+
+
+def comment_lines(lines, style):
+    """Yield the lines of a COMMENT_STYLES style file that strip_comments keeps, one at a time."""
+    return COMMENT_FILTERS[style](lines)
+
+
+def strip_comments(content, style):
+    """Drop whole-line comments and blank lines from content written in a COMMENT_STYLES style.
+
+    Comments that share a line with code are left alone. Lines inside
+    multi-line strings and comments that are kept are passed through as they
+    are: template literals and raw strings for the 'c' style, and quoted
+    strings, heredocs and YAML block scalars for the 'hash' style. The work
+    is done line by line, so streamed large files get the same result.
+    """
+    return '\n'.join(comment_lines(content.split('\n'), style))
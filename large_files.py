@@ -0,0 +1,102 @@
+import mmap
+import os
+
+LARGE_FILE_MODES = ('stream', 'truncate', 'skip')
+DEFAULT_THRESHOLD = 10 * 1024 * 1024
+# Lines handed to the line engine per batch when streaming.
+BATCH_LINES = 4096
+# Bytes checked per step when deciding whether a streamed file is valid UTF-8.
+VALIDATE_BYTES = 1024 * 1024
+
+
+def stream_encoding(file_path):
+    """The encoding sniff.decode would pick for the whole of file_path, found without holding it in memory."""
+    import codecs
+    from sniff import bom_encoding
+    with open(file_path, 'rb') as f:
+        encoding = bom_encoding(f.read(4))
+        if encoding is not None:
+            return encoding
+        if os.fstat(f.fileno()).st_size == 0:
+            return 'utf-8'
+        decoder = codecs.getincrementaldecoder('utf-8')()
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            try:
+                for start in range(0, len(mm), VALIDATE_BYTES):
+                    decoder.decode(mm[start:start + VALIDATE_BYTES])
+                decoder.decode(b'', final=True)
+            except UnicodeDecodeError:
+                return 'latin-1'
+    return 'utf-8'
+
+
+def iter_text_lines(file_path):
+    """Yield the lines of file_path without newlines, as decode_content(data).split('\\n') would.
+
+    The encoding is chosen for the whole file as in the in-memory path (a
+    BOM, else UTF-8 if every byte of the file is valid, else Latin-1), and
+    '\\r\\n' and '\\r' end lines too. Only one line is held at a time, so
+    memory stays bounded by the longest line rather than the file size.
+    """
+    ended = True
+    with open(file_path, encoding=stream_encoding(file_path), newline=None) as f:
+        for line in f:
+            ended = line.endswith('\n')
+            yield line[:-1] if ended else line
+    if ended:
+        yield ''
+
+
+class StreamedChunk:
+    """A dump chunk that is produced piece by piece when iterated.
+
+    It is picklable, so a pool worker can hand it back cheaply and leave the
+    reading to the process that writes the output. size is an upper bound
+    for budgets.
+    """
+
+    def __init__(self, file_path, size, process_lines):
+        self.file_path = file_path
+        self.size = size + len(f"# File: {file_path}\n\n\n".encode('utf-8'))
+        self.process_lines = process_lines
+
+    def __iter__(self):
+        yield f"# File: {self.file_path}\n"
+        yield from self.process_lines(self.file_path)
+        yield "\n\n"
+
+
+class LargeFilePolicy:
+    """What to do with files larger than threshold bytes.
+
+    stream processes them batch by batch from a memory map, truncate keeps
+    the first and last threshold/2 bytes (cut at line boundaries) and skip
+    replaces them with a one-line note.
+    """
+
+    def __init__(self, threshold=DEFAULT_THRESHOLD, mode='stream'):
+        if mode not in LARGE_FILE_MODES:
+            raise ValueError(f"Unknown large file mode: {mode}")
+        self.threshold = threshold
+        self.mode = mode
+
+    def __repr__(self):
+        return f"LargeFilePolicy({self.threshold}, {self.mode!r})"
+
+    def applies(self, size):
+        return size > self.threshold
+
+    def read_truncated(self, file_path, size):
+        """Return the head and tail of file_path as bytes with an omission marker between them."""
+        keep = self.threshold // 2
+        with open(file_path, 'rb') as f:
+            head = f.read(keep)
+            f.seek(size - keep)
+            tail = f.read(keep)
+        head = head[:head.rfind(b'\n') + 1]
+        tail = tail[tail.find(b'\n') + 1:]
+        omitted = size - len(head) - len(tail)
+        return head + f"# ... {omitted} bytes omitted ...\n".encode('utf-8') + tail
+
+    def skip_note(self, file_path, size):
+        return f"# File: {file_path}\n# Skipped: {size} bytes is over the {self.threshold} byte limit\n\n"
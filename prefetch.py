@@ -0,0 +1,56 @@
+from collections import deque
+
+from sniff import read_text
+
+DEFAULT_DEPTH = 16
+# Upper bound on the bytes of files being read ahead at any time.
+MAX_BYTES_IN_FLIGHT = 64 * 1024 * 1024
+
+
+def read_ahead(file_paths, depth=DEFAULT_DEPTH, sizes=None, max_bytes=MAX_BYTES_IN_FLIGHT, skip_above=None, skip=None):
+    """Yield (file_path, future) in the order of file_paths while a thread pool reads ahead.
+
+    Each future resolves to read_text(file_path) or raises what it would.
+    At most depth reads, and as far as sizes tell, max_bytes of file
+    content, are in flight or waiting for the consumer, so a slow consumer
+    stops the reading rather than piling up memory. Files larger than
+    skip_above, and files for which skip(file_path) is true, get a None
+    future and are left for the consumer to read.
+    Closing the generator early cancels the reads that have not started.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+    sizes = sizes or {}
+    window = deque()
+    in_flight = 0
+    pending = iter(file_paths)
+    exhausted = False
+    with ThreadPoolExecutor(max_workers=depth, thread_name_prefix='prefetch') as pool:
+        try:
+            while True:
+                while not exhausted and len(window) < depth and (not window or in_flight < max_bytes):
+                    file_path = next(pending, None)
+                    if file_path is None:
+                        exhausted = True
+                        break
+                    size = sizes.get(file_path, 0)
+                    if (skip_above is not None and size > skip_above) or (skip is not None and skip(file_path)):
+                        window.append((file_path, None, 0))
+                        continue
+                    window.append((file_path, pool.submit(read_text, file_path), size))
+                    in_flight += size
+                if not window:
+                    return
+                file_path, future, size = window.popleft()
+                in_flight -= size
+                yield file_path, future
+        finally:
+            for _, future, _ in window:
+                if future is not None:
+                    future.cancel()
+
+
+def prefetched(future):
+    """A read function for process_file that hands back what future read, or None to read normally."""
+    if future is None:
+        return None
+    return lambda file_path: future.result()
@@ -0,0 +1,224 @@
+import re
+from functools import lru_cache
+
+RULES = {}
+DEFAULT_RULES = ('imports', 'docstrings', 'except', 'logger', 'comments')
+
+
+def register_rule(cls):
+    """Class decorator that makes a Rule selectable by its name."""
+    RULES[cls.name] = cls
+    return cls
+
+
+class Rule:
+    """One omission rule of process_content.
+
+    prefixes are matched against the start of the stripped line (or of the raw
+    line when anchored is set); a match calls handle(). While a rule is
+    active, resume() sees every later line first. Both return True when they
+    consume the line. A fresh instance is created per process_content call, so
+    rules may keep state on self. needs lists substrings of which at least
+    one must occur in the content for the rule to have any effect; it
+    defaults to prefixes, and rules without any are always applied.
+    """
+
+    name = None
+    prefixes = ()
+    anchored = False
+    needs = None
+
+    def __init__(self, output):
+        self.output = output
+        self.active = False
+
+    def handle(self, line, indent):
+        return False
+
+    def resume(self, line, indent):
+        return False
+
+    def transform(self, line):
+        """Rewrite a line no rule consumed; return '' to drop it."""
+        return line
+
+    @classmethod
+    def applies(cls, content):
+        needs = cls.prefixes if cls.needs is None else cls.needs
+        return not needs or any(needle in content for needle in needs)
+
+
+@register_rule
+class ImportsRule(Rule):
+    name = 'imports'
+    prefixes = ('from', 'import')
+    anchored = True
+
+    def __init__(self, output):
+        super().__init__(output)
+        self.imports_found = False
+
+    def handle(self, line, indent):
+        if not self.imports_found:
+            self.output.append("# Imports omitted for brevity...")
+        self.imports_found = True
+        if '(' in line and ')' not in line:
+            self.active = True
+        return True
+
+    def resume(self, line, indent):
+        if ')' in line:
+            self.active = False
+        return True
+
+
+@register_rule
+class DocstringsRule(Rule):
+    name = 'docstrings'
+    prefixes = ('def ', 'class ')
+    # Only lines holding triple quotes are ever consumed.
+    needs = ('"""',)
+
+    def __init__(self, output):
+        super().__init__(output)
+        self.in_docstring = False
+        self.in_definition_docstring = False
+
+    def handle(self, line, indent):
+        self.active = True
+        return self.resume(line, indent)
+
+    def resume(self, line, indent):
+        if '"""' in line:
+            if line.count('"""') % 2 != 0:
+                self.in_docstring = not self.in_docstring
+                if self.in_docstring:
+                    self.in_definition_docstring = True
+                    return True
+                self.active = False
+                if self.in_definition_docstring:
+                    self.in_definition_docstring = False
+                    return True
+            elif self.in_definition_docstring:
+                return True
+        elif self.in_docstring and self.in_definition_docstring:
+            return True
+        return False
+
+
+@register_rule
+class ExceptRule(Rule):
+    name = 'except'
+    prefixes = ('except ',)
+
+    def handle(self, line, indent):
+        self.skip_block_indent = indent
+        self.active = True
+        self.output.append(line)
+        self.output.append(f'{" " * indent}# Code omitted for brevity...')
+        self.output.append(f'{" " * (indent + 1)}pass')
+        return True
+
+    def resume(self, line, indent):
+        if indent > self.skip_block_indent:
+            return True
+        self.active = False
+        return False
+
+
+class StatementRule(Rule):
+    """Drops a statement, following it across lines until its parentheses balance."""
+
+    def __init__(self, output):
+        super().__init__(output)
+        self.parenthesis_balance = 0
+
+    def handle(self, line, indent):
+        self.active = True
+        return self.resume(line, indent)
+
+    def resume(self, line, indent):
+        self.parenthesis_balance += line.count("(") - line.count(")")
+        if self.parenthesis_balance <= 0:
+            self.active = False
+            self.parenthesis_balance = 0
+        return True
+
+
+@register_rule
+class LoggerRule(StatementRule):
+    name = 'logger'
+    prefixes = ('logger.',)
+
+
+@register_rule
+class PrintRule(StatementRule):
+    name = 'print'
+    prefixes = ('print(',)
+
+
+@register_rule
+class AssertRule(StatementRule):
+    name = 'assert'
+    prefixes = ('assert ', 'assert(')
+
+
+@register_rule
+class CommentsRule(Rule):
+    name = 'comments'
+    needs = ('#',)
+
+    def transform(self, line):
+        comment_index = line.find("#")
+        if comment_index != -1:
+            if not any(map(lambda q: q in line[:comment_index], ('"', "'"))):
+                return line[:comment_index].rstrip()
+        return line
+
+
+@register_rule
+class OtherCommentsRule(Rule):
+    """Turns on comment stripping for the languages in languages.COMMENT_STYLES; Python files are not affected."""
+    name = 'other_comments'
+
+    @classmethod
+    def applies(cls, content):
+        return False
+
+
+def parse_rules(value):
+    """Turn a --rules value such as 'imports,logger,except' into a tuple of rule names."""
+    names = tuple(name.strip() for name in value.split(',') if name.strip())
+    unknown = [name for name in names if name not in RULES]
+    if unknown:
+        raise ValueError(f"Unknown rules: {', '.join(unknown)} (available: {', '.join(RULES)})")
+    return names
+
+
+def applicable_rules(content, names):
+    """The subset of rule names that can change content, in the same order."""
+    return tuple(name for name in names if RULES[name].applies(content))
+
+
+@lru_cache(maxsize=None)
+def compile_rules(names=DEFAULT_RULES):
+    """Return (rule classes in priority order, top-level table, indented table) for names.
+
+    The tables map the first character of a stripped line to one regex holding
+    every trigger prefix that starts with it, with a named group per rule, so
+    classifying a line is one dict lookup and at most one match call however
+    many rules are enabled. Anchored prefixes only go into the top-level table.
+    """
+    classes = [cls for cls in RULES.values() if cls.name in names]
+    top_level, indented = {}, {}
+    for index, cls in enumerate(classes):
+        for prefix in cls.prefixes:
+            tables = (top_level,) if cls.anchored else (top_level, indented)
+            for table in tables:
+                table.setdefault(prefix[0], {}).setdefault(f"r{index}", []).append(re.escape(prefix))
+
+    def build(table):
+        return {char: re.compile('|'.join(f"(?P<{group}>{'|'.join(prefixes)})" for group, prefixes in groups.items()))
+                for char, groups in table.items()}
+
+    return classes, build(top_level), build(indented)
@@ -0,0 +1,128 @@
+import os
+import re
+from collections import namedtuple
+
+# size and mtime_ns are only filled in for files; directories carry None.
+Entry = namedtuple('Entry', 'path name is_dir size mtime_ns')
+
+
+def suffix(name):
+    """Path(name).suffix without building a Path."""
+    i = name.rfind('.')
+    if 0 < i < len(name) - 1:
+        return name[i:]
+    return ''
+
+
+def compile_globs(patterns):
+    """Fold glob patterns into one regex matched against '/'-separated relative paths.
+
+    Patterns without a '/' match the base name at any depth, like .gitignore.
+    """
+    if not patterns:
+        return None
+    import fnmatch
+    parts = []
+    for pattern in patterns:
+        pattern = pattern.strip('/')
+        regex = fnmatch.translate(pattern)
+        parts.append(regex if '/' in pattern else rf'(?:.*/)?{regex}')
+    return re.compile('|'.join(f'(?:{part})' for part in parts))
+
+
+class Filters:
+    """Include/exclude rules compiled once into set lookups and glob regexes."""
+
+    def __init__(self, include_ext=None, exclude_ext=None, include_dirs=None, exclude_dirs=None,
+                 include_globs=None, exclude_globs=None):
+        self.include_ext = frozenset(include_ext) if include_ext else None
+        self.exclude_ext = frozenset(exclude_ext) if exclude_ext else None
+        self.include_dirs = frozenset(include_dirs) if include_dirs else None
+        self.exclude_dirs = frozenset(exclude_dirs) if exclude_dirs else None
+        self.include_globs = compile_globs(include_globs)
+        self.exclude_globs = compile_globs(exclude_globs)
+
+    def dir_ok(self, name, relpath):
+        if self.include_dirs is not None and name not in self.include_dirs:
+            return False
+        if self.exclude_dirs is not None and name in self.exclude_dirs:
+            return False
+        if self.exclude_globs is not None and self.exclude_globs.match(relpath):
+            return False
+        return True
+
+    def file_ok(self, name, relpath):
+        if self.include_ext is not None or self.exclude_ext is not None:
+            ext = suffix(name)
+            if self.include_ext is not None and ext not in self.include_ext:
+                return False
+            if self.exclude_ext is not None and ext in self.exclude_ext:
+                return False
+        if self.include_globs is not None and not self.include_globs.match(relpath):
+            return False
+        if self.exclude_globs is not None and self.exclude_globs.match(relpath):
+            return False
+        return True
+
+
+def path_allowed(filters, relpath):
+    """Whether walking would reach relpath ('/'-separated) through filters: every parent directory and the file must pass."""
+    parts = relpath.split('/')
+    for depth in range(1, len(parts)):
+        if not filters.dir_ok(parts[depth - 1], '/'.join(parts[:depth])):
+            return False
+    return filters.file_ok(parts[-1], relpath)
+
+
+def walk(top, filters=None, followlinks=False):
+    """Top-down walk like os.walk, yielding (dirpath, dir_entries, file_entries).
+
+    Built on os.scandir so file/dir classification comes from the cached
+    d_type, and only files that pass the filters are stat'ed. filters is
+    anything with dir_ok(name, relpath) and file_ok(name, relpath), usually a
+    Filters. Removing entries from dir_entries prunes the walk, as with os.walk.
+    Paths are joined the way pathlib joins them, so '# File:' headers match
+    the ones built from Path objects.
+    """
+    from pathlib import Path
+    top = os.fspath(Path(top))
+    stack = [(top, '')]
+    while stack:
+        dirpath, reldir = stack.pop()
+        prefix = '' if dirpath == '.' else dirpath.rstrip(os.sep) + os.sep
+        dirs, files = [], []
+        try:
+            with os.scandir(dirpath) as it:
+                for entry in it:
+                    name = entry.name
+                    relpath = f"{reldir}{name}"
+                    try:
+                        is_dir = entry.is_dir()
+                    except OSError:
+                        is_dir = False
+                    if is_dir:
+                        if filters is None or filters.dir_ok(name, relpath):
+                            follow = followlinks or not entry.is_symlink()
+                            dirs.append((Entry(prefix + name, name, True, None, None), follow))
+                    elif filters is None or filters.file_ok(name, relpath):
+                        try:
+                            st = entry.stat()
+                        except OSError:
+                            continue
+                        files.append(Entry(prefix + name, name, False, st.st_size, st.st_mtime_ns))
+        except OSError:
+            continue
+
+        dir_entries = [entry for entry, _ in dirs]
+        yield dirpath, dir_entries, files
+
+        follow = {entry.path for entry, follow in dirs if follow}
+        for entry in reversed(dir_entries):
+            if entry.path in follow:
+                stack.append((entry.path, f"{reldir}{entry.name}/"))
+
+
+def scan(top, filters=None):
+    """Yield the file Entries under top in os.walk order."""
+    for _, _, files in walk(top, filters):
+        yield from files
@@ -0,0 +1,276 @@
+import io
+import os
+import sys
+
+# Clipboard tools that read the payload on stdin, so it can be streamed to them chunk by chunk.
+CLIPBOARD_COMMANDS = {
+    'wl-copy': ['wl-copy'],
+    'xclip': ['xclip', '-selection', 'clipboard', '-in'],
+    'xsel': ['xsel', '--clipboard', '--input'],
+    'pbcopy': ['pbcopy'],
+}
+CLIPBOARD_BACKENDS = ('auto', 'pyperclip') + tuple(CLIPBOARD_COMMANDS) + ('none',)
+# Payloads above this many characters go to a file instead; clipboard managers struggle well before it.
+DEFAULT_CLIPBOARD_LIMIT = 64 * 1024 * 1024
+# Outputs ending in this are written as an indexed archive (see archive.ArchiveSink).
+ARCHIVE_SUFFIX = '.cfa'
+
+
+class Discard:
+    """A text stream that drops everything, for status output nobody reads."""
+
+    def write(self, text):
+        return len(text)
+
+    def flush(self):
+        pass
+
+
+class ClipboardSink:
+    """Collects chunks and copies them to the clipboard as one buffer on close."""
+
+    message = "copied to clipboard"
+    status_stream = None
+
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, chunk):
+        self.chunks.append(chunk)
+
+    def close(self):
+        import pyperclip
+        pyperclip.copy("".join(self.chunks))
+        self.chunks = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+
+
+class PipeClipboardSink:
+    """Streams chunks into the stdin of a clipboard tool such as xclip or wl-copy.
+
+    Nothing is joined in memory; the tool is started on the first write.
+    """
+
+    message = "copied to clipboard"
+    status_stream = None
+
+    def __init__(self, command):
+        self.command = command
+        self.process = None
+
+    def _start(self):
+        import subprocess
+        # xclip keeps serving the selection in a forked child that inherits
+        # stdout and stderr, so neither may be a pipe we wait on.
+        self.process = subprocess.Popen(self.command, stdin=subprocess.PIPE,
+                                        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+    def write(self, chunk):
+        if self.process is None:
+            self._start()
+        self.process.stdin.write(chunk.encode('utf-8'))
+
+    def close(self):
+        if self.process is None:
+            self._start()
+        self.process.stdin.close()
+        if self.process.wait() != 0:
+            raise RuntimeError(f"{self.command[0]} exited with status {self.process.returncode}")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        elif self.process is not None:
+            self.process.kill()
+            self.process.wait()
+
+
+class NullSink:
+    """Discards everything and only counts characters, for benchmarks and headless runs."""
+
+    message = "discarded"
+    status_stream = None
+
+    def __init__(self):
+        self.size = 0
+
+    def write(self, chunk):
+        self.size += len(chunk)
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class StreamSink:
+    """Writes chunks straight to an open text stream."""
+
+    def __init__(self, stream, name):
+        self.stream = stream
+        self.message = f"written to {name}"
+        # Keep progress output out of the dump when it goes to stdout.
+        self.status_stream = sys.stderr if stream is sys.stdout else None
+
+    def write(self, chunk):
+        self.stream.write(chunk)
+
+    def close(self):
+        self.stream.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class StringSink(StreamSink):
+    """Collects the dump in memory for library callers; progress lines are dropped."""
+
+    def __init__(self):
+        super().__init__(io.StringIO(), "string")
+        self.status_stream = Discard()
+
+    def value(self):
+        return self.stream.getvalue()
+
+
+class FileSink(StreamSink):
+    def __init__(self, path):
+        super().__init__(open(path, 'w', encoding='utf-8'), path)
+
+    def close(self):
+        self.stream.close()
+
+
+class GzipFileSink(StreamSink):
+    def __init__(self, path):
+        import gzip
+        super().__init__(gzip.open(path, 'wt', encoding='utf-8'), path)
+
+    def close(self):
+        self.stream.close()
+
+
+class LimitedClipboardSink:
+    """Holds chunks for a clipboard sink until close, or sends everything to fallback
+    once they pass limit characters, so huge dumps never reach the clipboard."""
+
+    def __init__(self, clipboard, limit, fallback):
+        self.clipboard = clipboard
+        self.limit = limit
+        self.fallback = fallback
+        self.chunks = []
+        self.size = 0
+        self.spilled = None
+        self.message = clipboard.message
+        # Decided up front: progress lines are printed before it is known where the dump goes.
+        self.status_stream = sys.stderr if fallback == '-' else clipboard.status_stream
+
+    def write(self, chunk):
+        if self.spilled is not None:
+            self.spilled.write(chunk)
+            return
+        self.chunks.append(chunk)
+        self.size += len(chunk)
+        if self.size > self.limit:
+            self.spilled = open_sink(self.fallback)
+            for pending in self.chunks:
+                self.spilled.write(pending)
+            self.chunks = []
+            self.message = f"{self.spilled.message} (over the {self.limit} character clipboard limit)"
+
+    def close(self):
+        if self.spilled is not None:
+            self.spilled.close()
+            return
+        for chunk in self.chunks:
+            self.clipboard.write(chunk)
+        self.chunks = []
+        self.clipboard.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        elif self.spilled is not None:
+            self.spilled.close()
+
+
+def detect_clipboard():
+    """Pick the clipboard backend for this session: a streaming tool if one is usable, else pyperclip."""
+    if sys.platform == 'darwin':
+        candidates = ['pbcopy']
+    elif os.environ.get('WAYLAND_DISPLAY'):
+        candidates = ['wl-copy', 'xclip', 'xsel']
+    elif os.environ.get('DISPLAY'):
+        candidates = ['xclip', 'xsel']
+    else:
+        candidates = []
+    import shutil
+    for name in candidates:
+        if shutil.which(CLIPBOARD_COMMANDS[name][0]):
+            return name
+    return 'pyperclip'
+
+
+def default_fallback_path():
+    import tempfile
+    return os.path.join(tempfile.gettempdir(), 'copy_files_dump.txt')
+
+
+def clipboard_sink(backend='auto', limit=DEFAULT_CLIPBOARD_LIMIT, fallback=None):
+    """Return a sink for one of CLIPBOARD_BACKENDS.
+
+    Payloads over limit characters are written to fallback instead (a path,
+    or '-' for stdout; default: copy_files_dump.txt in the temp directory).
+    A falsy limit disables the fallback.
+    """
+    if backend == 'none':
+        return NullSink()
+    if backend == 'auto':
+        backend = detect_clipboard()
+    if backend == 'pyperclip':
+        sink = ClipboardSink()
+    elif backend in CLIPBOARD_COMMANDS:
+        sink = PipeClipboardSink(CLIPBOARD_COMMANDS[backend])
+    else:
+        raise ValueError(f"Unknown clipboard backend: {backend}")
+    if limit:
+        sink = LimitedClipboardSink(sink, limit, fallback or default_fallback_path())
+    return sink
+
+
+def open_sink(output=None):
+    """Return the sink for an --output value: None for the clipboard, '-' for stdout,
+    a path ending in .gz for a gzip file, in .cfa for an indexed archive,
+    anything else for a plain file. A sink object (anything with write) is
+    returned as is."""
+    if hasattr(output, 'write'):
+        return output
+    if output is None:
+        return clipboard_sink()
+    if output == '-':
+        return StreamSink(sys.stdout, "stdout")
+    if output.endswith('.gz'):
+        return GzipFileSink(output)
+    if output.endswith(ARCHIVE_SUFFIX):
+        from archive import ArchiveSink
+        return ArchiveSink(output)
+    return FileSink(output)
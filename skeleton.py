@@ -0,0 +1,195 @@
+from rules import DEFAULT_RULES
+
+QUOTES = ('"""', "'''")
+STRING_PREFIXES = 'rRuUbBfF'
+
+
+def process_content_skeleton(content, modify_python, rules=DEFAULT_RULES):
+    """Outline of a Python file: signatures and decorators kept, function bodies collapsed to '...'.
+
+    One line pass drops every function body, following indentation and
+    triple-quoted strings, and cuts def and class docstrings to their first
+    line (or drops them when the docstrings rule is on). The outline then
+    goes through the line engine with the same rules but docstrings, which
+    the pass has already dealt with, so imports, comments and the rest are
+    handled as usual.
+    """
+    if not modify_python or not content.strip():
+        return content
+
+    from copy_files import LineProcessor
+    processor = LineProcessor(tuple(rule for rule in rules if rule != 'docstrings'))
+    processor.feed(outline(content.split('\n'), 'docstrings' not in rules))
+    return '\n'.join(processor.output)
+
+
+def bracket_balance(text):
+    return (text.count('(') + text.count('[') + text.count('{')
+            - text.count(')') - text.count(']') - text.count('}'))
+
+
+def body_colon(line, balance):
+    """Index of the ':' that ends a def header on line, given the bracket balance before it, or -1."""
+    for i, char in enumerate(line):
+        if char in '([{':
+            balance += 1
+        elif char in ')]}':
+            balance -= 1
+        elif char == ':' and balance == 0:
+            return i
+        elif char == '#':
+            break
+    return -1
+
+
+def open_quote(line, quote=None):
+    """The triple quote left open at the end of line, if any, starting inside quote.
+
+    Quotes are followed in order, so a triple quote inside an ordinary string
+    or after a comment does not count.
+    """
+    i, n = 0, len(line)
+    while i < n:
+        char = line[i]
+        if quote is not None:
+            if char == '\\':
+                i += 2
+                continue
+            if line.startswith(quote, i):
+                i += len(quote)
+                quote = None
+                continue
+        elif char == '#':
+            break
+        elif char in '"\'':
+            quote = line[i:i + 3] if line[i:i + 3] in QUOTES else char
+            i += len(quote)
+            continue
+        i += 1
+    return quote if quote in QUOTES else None
+
+
+def string_quote(stripped):
+    """The quote that opens the string literal stripped starts with, or None."""
+    body = stripped[:2].lstrip(STRING_PREFIXES) + stripped[2:]
+    if body[:3] in QUOTES:
+        return body[:3]
+    if body[:1] in ('"', "'"):
+        return body[:1]
+    return None
+
+
+def docstring_text(text, quote):
+    """Return (text up to quote, stripped; whether quote closes on this line)."""
+    end = text.find(quote)
+    if end != -1:
+        return text[:end].strip(), True
+    return text.strip(), False
+
+
+def one_line_docstring(text, indent):
+    if not text or '\\' in text or text.endswith('"') or '"""' in text:
+        return f"{' ' * indent}{text!r}" if text else None
+    return f'{" " * indent}"""{text}"""'
+
+
+def outline(lines, keep_docstrings=True):
+    """Yield the lines of source with each def body replaced by '...' and docstrings cut to one line."""
+    skip_indent = None      # indent of the def whose body is being dropped
+    in_string = None        # triple quote left open in a dropped line
+    header = None           # (kind, indent, bracket balance) while a multi-line header is open
+    body_of = None          # (kind, indent) between a header and the first line of its body
+    doc = None              # (kind, indent) of a docstring whose first line of text is still to come
+    verbatim = None         # triple quote left open in a kept line; its text is kept as it is
+    for line in lines:
+        if verbatim is not None:
+            verbatim = open_quote(line, verbatim)
+            yield line
+            continue
+        stripped = line.lstrip()
+        if in_string is not None:
+            still_open = open_quote(line, in_string)
+            closes = still_open is None
+            if doc is not None and (stripped or closes):
+                kind, doc_indent = doc
+                text, _ = docstring_text(stripped, in_string)
+                docstring = one_line_docstring(text, doc_indent)
+                if docstring is not None and keep_docstrings:
+                    yield docstring
+                if kind == 'def':
+                    yield f"{' ' * doc_indent}..."
+                doc = None
+            in_string = still_open
+            continue
+        if not stripped or stripped[0] == '#':
+            if skip_indent is None and body_of is None:
+                yield line
+            continue
+        indent = len(line) - len(stripped)
+
+        if skip_indent is not None:
+            if indent > skip_indent:
+                in_string = open_quote(line)
+                continue
+            skip_indent = None
+
+        if header is not None:
+            kind, header_indent, balance = header
+            colon = body_colon(line, balance)
+            balance += bracket_balance(line)
+            if balance > 0 or colon == -1:
+                header = (kind, header_indent, balance)
+                yield line
+                continue
+            header = None
+            yield close_header(line, colon, kind)
+            if not line[colon + 1:].split('#', 1)[0].strip():
+                body_of = (kind, header_indent)
+            continue
+
+        if body_of is not None:
+            kind, header_indent = body_of
+            body_of = None
+            if indent > header_indent:
+                quote = string_quote(stripped)
+                if quote is not None:
+                    text, closed = docstring_text(stripped[stripped.index(quote) + len(quote):], quote)
+                    if not closed and len(quote) == 3:
+                        in_string = quote
+                    if in_string is not None and not text:
+                        doc = (kind, indent)
+                    else:
+                        docstring = one_line_docstring(text, indent)
+                        if docstring is not None and keep_docstrings:
+                            yield docstring
+                if kind == 'def':
+                    if doc is None:
+                        yield f"{' ' * indent}..."
+                    skip_indent = header_indent
+                    if quote is None:
+                        in_string = open_quote(line)
+                if quote is not None or kind == 'def':
+                    continue
+
+        if stripped.startswith(('def ', 'async def ', 'class ')):
+            kind = 'class' if stripped.startswith('class ') else 'def'
+            colon = body_colon(line, 0)
+            balance = bracket_balance(line)
+            if balance > 0 or colon == -1:
+                header = (kind, indent, balance)
+                yield line
+                continue
+            yield close_header(line, colon, kind)
+            if not line[colon + 1:].split('#', 1)[0].strip():
+                body_of = (kind, indent)
+            continue
+
+        verbatim = open_quote(line)
+        yield line
+
+
+def close_header(line, colon, kind):
+    """The last line of a def or class header, with the body of a one-line def cut off."""
+    if kind == 'def' and line[colon + 1:].split('#', 1)[0].strip():
+        return f"{line[:colon + 1]} ..."
+    return line
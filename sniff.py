@@ -0,0 +1,95 @@
+import codecs
+import os
+
+# Bytes read up front to tell text from binary.
+SNIFF_BYTES = 8192
+# Share of non-text bytes in the sniffed head above which a file counts as binary.
+BINARY_RATIO = 0.3
+
+BOMS = (
+    (codecs.BOM_UTF8, 'utf-8-sig'),
+    (codecs.BOM_UTF32_LE, 'utf-32'),
+    (codecs.BOM_UTF32_BE, 'utf-32'),
+    (codecs.BOM_UTF16_LE, 'utf-16'),
+    (codecs.BOM_UTF16_BE, 'utf-16'),
+)
+
+# Signatures used to name binary files in the note that replaces them.
+MAGIC = (
+    (b'\x89PNG\r\n\x1a\n', 'PNG image'),
+    (b'\xff\xd8\xff', 'JPEG image'),
+    (b'GIF8', 'GIF image'),
+    (b'%PDF-', 'PDF document'),
+    (b'PK\x03\x04', 'ZIP archive'),
+    (b'\x1f\x8b', 'gzip data'),
+    (b'\x7fELF', 'ELF executable'),
+    (b'SQLite format 3\x00', 'SQLite database'),
+    (b'\x00asm', 'WebAssembly module'),
+)
+
+TEXT_BYTES = bytes({7, 8, 9, 10, 12, 13, 27} | set(range(0x20, 0x100)) - {0x7f})
+
+
+class BinaryFile(Exception):
+    """Raised by read_text when the head of a file does not look like text."""
+
+    def __init__(self, file_path, head, size):
+        super().__init__(f"{file_path} is binary")
+        self.file_path = file_path
+        self.head = head
+        self.size = size
+
+
+def bom_encoding(head):
+    for bom, encoding in BOMS:
+        if head.startswith(bom):
+            return encoding
+    return None
+
+
+def is_binary(head):
+    """Guess from the first bytes of a file whether it is binary, the way file(1) and git do."""
+    if not head or bom_encoding(head) is not None:
+        return False
+    if b'\0' in head:
+        return True
+    return len(head.translate(None, TEXT_BYTES)) > len(head) * BINARY_RATIO
+
+
+def describe(head):
+    for magic, kind in MAGIC:
+        if head.startswith(magic):
+            return kind
+    return 'binary data'
+
+
+def binary_note(error):
+    return f"# File: {error.file_path}\n# Skipped: {describe(error.head)}, {error.size} bytes\n\n"
+
+
+def read_text(file_path):
+    """Return the bytes of file_path, raising BinaryFile after reading only SNIFF_BYTES if it is binary."""
+    with open(file_path, 'rb') as f:
+        head = f.read(SNIFF_BYTES)
+        if is_binary(head):
+            raise BinaryFile(file_path, head, os.fstat(f.fileno()).st_size)
+        return head + f.read()
+
+
+def sniff(file_path):
+    """Raise BinaryFile if file_path is binary, reading only its head."""
+    with open(file_path, 'rb') as f:
+        head = f.read(SNIFF_BYTES)
+        if is_binary(head):
+            raise BinaryFile(file_path, head, os.fstat(f.fileno()).st_size)
+
+
+def decode(data):
+    """Decode file bytes: a BOM wins, then UTF-8, then Latin-1, which accepts any byte."""
+    encoding = bom_encoding(data)
+    if encoding is not None:
+        return data.decode(encoding)
+    try:
+        return data.decode('utf-8')
+    except UnicodeDecodeError:
+        return data.decode('latin-1')
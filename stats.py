@@ -0,0 +1,130 @@
+import time
+
+EVENTS = ('stage', 'file', 'done')
+PROFILE_MODES = ('cprofile', 'tracemalloc')
+DEFAULT_TOP = 10
+
+
+class Hooks:
+    """Callbacks fired while a dump runs, for --stats and for library callers.
+
+    Events and their arguments:
+      stage(name, seconds, nbytes)  scan, emit and output, once each, when they finish
+      file(file_path, read_seconds, transform_seconds, nbytes)  after each file is processed
+      done(seconds)  wall time of the whole run
+
+    Per-file times are measured inside the worker that handled the file, so
+    with --jobs they add up to more than the wall time.
+    """
+
+    def __init__(self):
+        self.subscribers = {event: [] for event in EVENTS}
+
+    def subscribe(self, event, callback):
+        if event not in self.subscribers:
+            raise ValueError(f"Unknown event: {event}")
+        self.subscribers[event].append(callback)
+
+    def unsubscribe(self, event, callback):
+        self.subscribers[event].remove(callback)
+
+    def wants(self, event):
+        return bool(self.subscribers[event])
+
+    def emit(self, event, *args):
+        for callback in self.subscribers[event]:
+            callback(*args)
+
+
+def timed_iter(iterable, stage, hooks, size=None):
+    """Pass items through, emitting stage with the time spent producing them.
+
+    size(item) gives the bytes an item accounts for.
+    """
+    if hooks is None or not hooks.wants('stage'):
+        yield from iterable
+        return
+    seconds, nbytes = 0.0, 0
+    it = iter(iterable)
+    while True:
+        start = time.perf_counter()
+        try:
+            item = next(it)
+        except StopIteration:
+            seconds += time.perf_counter() - start
+            break
+        seconds += time.perf_counter() - start
+        if size is not None:
+            nbytes += size(item)
+        yield item
+    hooks.emit('stage', stage, seconds, nbytes)
+
+
+class Stats:
+    """Collects the events of one run into a per-stage breakdown for --stats."""
+
+    def __init__(self, hooks, top=DEFAULT_TOP):
+        self.top = top
+        self.stages = {}
+        self.files = []
+        self.seconds = None
+        hooks.subscribe('stage', self.on_stage)
+        hooks.subscribe('file', self.on_file)
+        hooks.subscribe('done', self.on_done)
+
+    def on_stage(self, name, seconds, nbytes):
+        total_seconds, total_bytes = self.stages.get(name, (0.0, 0))
+        self.stages[name] = (total_seconds + seconds, total_bytes + nbytes)
+
+    def on_file(self, file_path, read_seconds, transform_seconds, nbytes):
+        self.files.append((read_seconds + transform_seconds, file_path, nbytes))
+        self.on_stage('read', read_seconds, nbytes)
+        self.on_stage('transform', transform_seconds, nbytes)
+
+    def on_done(self, seconds):
+        self.seconds = seconds
+
+    def report(self):
+        lines = [f"{'stage':>10} {'seconds':>9} {'MB':>9}"]
+        for name in ('scan', 'read', 'transform', 'emit', 'output'):
+            if name in self.stages:
+                seconds, nbytes = self.stages[name]
+                lines.append(f"{name:>10} {seconds:>9.3f} {nbytes / 1e6:>9.2f}")
+        if self.seconds is not None:
+            lines.append(f"{'total':>10} {self.seconds:>9.3f}   ({len(self.files)} files)")
+        slowest = sorted(self.files, reverse=True)[:self.top]
+        if slowest:
+            lines.append(f"slowest {len(slowest)} files:")
+            lines.extend(f"  {seconds:>8.4f}s {nbytes:>10} bytes  {path}" for seconds, path, nbytes in slowest)
+        return '\n'.join(lines) + '\n'
+
+
+def run_profiled(mode, path, fn, *args):
+    """Call fn(*args) under cProfile or tracemalloc and write the result to path.
+
+    cprofile writes pstats data (open with python -m pstats); tracemalloc
+    writes the top allocation sites as text. Only the calling process is
+    profiled, not --jobs workers.
+    """
+    if mode == 'cprofile':
+        import cProfile
+        profiler = cProfile.Profile()
+        try:
+            return profiler.runcall(fn, *args)
+        finally:
+            profiler.dump_stats(path)
+    if mode != 'tracemalloc':
+        raise ValueError(f"Unknown profile mode: {mode}")
+
+    import tracemalloc
+    tracemalloc.start()
+    try:
+        return fn(*args)
+    finally:
+        snapshot = tracemalloc.take_snapshot()
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(f"# current {current} bytes, peak {peak} bytes\n")
+            for stat in snapshot.statistics('lineno')[:50]:
+                f.write(f"{stat}\n")
@@ -0,0 +1,114 @@
+import io
+import tokenize
+from tokenize import COMMENT, DEDENT, ENDMARKER, INDENT, NAME, NEWLINE, NL, OP, STRING
+
+from rules import DEFAULT_RULES
+
+# Statement rules and the token that must follow their keyword.
+STATEMENT_RULES = {'logger': '.', 'print': '(', 'assert': None}
+
+
+def process_content_tokenize(content, modify_python, rules=DEFAULT_RULES):
+    """Token-based equivalent of copy_files.process_content.
+
+    Makes one pass over the tokenize stream and decides per logical line
+    whether to keep it, so '#' and quotes inside strings are never mistaken
+    for comments or docstrings. Like the line engine it keeps one-line
+    docstrings and only folds 'except ...:' blocks, not a bare 'except:'.
+    Unlike it, docstrings in single quotes are dropped too. Falls back to
+    the line engine for source that does not tokenize.
+    """
+    if not modify_python or not content.strip():
+        return content
+
+    try:
+        return _strip_tokens(content, frozenset(rules))
+    except (tokenize.TokenError, SyntaxError):
+        from copy_files import process_content
+        return process_content(content, modify_python, rules)
+
+
+def _strip_tokens(content, rules):
+    lines = content.split('\n')
+    new_content = []
+    comments = {}
+    logical = []
+    imports_found = False
+    depth = 0
+    skip_depth = None
+    pending_except = False
+    pending_definition = False
+    docstring_allowed = False
+
+    for tok in tokenize.generate_tokens(io.StringIO(content).readline):
+        ttype = tok.type
+        if ttype == COMMENT:
+            if 'comments' in rules:
+                comments[tok.start[0]] = tok.start[1]
+            continue
+        if ttype == NL:
+            continue
+        if ttype == INDENT:
+            depth += 1
+            if pending_except and skip_depth is None:
+                skip_depth = depth
+            docstring_allowed = pending_definition
+            pending_except = pending_definition = False
+            continue
+        if ttype == DEDENT:
+            depth -= 1
+            if skip_depth is not None and depth < skip_depth:
+                skip_depth = None
+            continue
+        if ttype == ENDMARKER:
+            break
+        if ttype != NEWLINE:
+            logical.append(tok)
+            continue
+        if not logical:
+            continue
+
+        first = logical[0]
+        keyword = first.string if first.type == NAME else None
+        is_block = logical[-1].type == OP and logical[-1].string == ':'
+        first_in_body = docstring_allowed
+        docstring_allowed = pending_except = pending_definition = False
+        logical, tokens = [], logical
+
+        if skip_depth is not None:
+            continue
+
+        if keyword in ('import', 'from') and first.start[1] == 0 and 'imports' in rules:
+            if not imports_found:
+                new_content.append("# Imports omitted for brevity...")
+            imports_found = True
+            continue
+
+        if (first_in_body and len(tokens) == 1 and first.type == STRING and first.start[0] != first.end[0]
+                and 'docstrings' in rules):
+            continue
+
+        if keyword in STATEMENT_RULES and keyword in rules:
+            follower = STATEMENT_RULES[keyword]
+            if follower is None or (len(tokens) > 1 and tokens[1].string == follower):
+                continue
+
+        for row in range(first.start[0], tok.start[0] + 1):
+            line = lines[row - 1]
+            if row in comments:
+                line = line[:comments[row]].rstrip()
+            if line.strip():
+                new_content.append(line)
+
+        if not is_block:
+            continue
+        # A bare 'except:' is kept whole, as the line engine only matches 'except '.
+        if keyword == 'except' and tokens[1].start != first.end and 'except' in rules:
+            indent = first.start[1]
+            new_content.append(f'{" " * indent}# Code omitted for brevity...')
+            new_content.append(f'{" " * (indent + 1)}pass')
+            pending_except = True
+        elif keyword in ('def', 'class') or (keyword == 'async' and tokens[1].string == 'def'):
+            pending_definition = True
+
+    return '\n'.join(new_content)